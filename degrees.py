@@ -1,63 +1,606 @@
+import argparse
 import csv
+import heapq
+import json
+import math
+import mmap
+import multiprocessing
+import os
+import re
+import struct
 import sys
+import time
+from array import array
+from bisect import bisect_left
 from collections import deque
+from collections.abc import Mapping
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Binary snapshot of the parsed dataset, kept alongside the CSV files
+SNAPSHOT = "degrees.snapshot"
+SNAPSHOT_MAGIC = b"DEGREES\0"
+SNAPSHOT_VERSION = 2
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+SNAPSHOT_HEADER = struct.Struct("<8sI6q")
+
+# Landmark distance index, kept alongside the snapshot
+LANDMARKS = "degrees.landmarks"
+LANDMARKS_MAGIC = b"LANDMARK"
+LANDMARKS_VERSION = 1
+
+# Landmark distance meaning "not reachable"; longer distances are stored as this too
+UNREACHABLE = 255
+
+# Graph fields stored in a snapshot, in file order
+ARRAY_FIELDS = (
+    ("person_offsets", "q"),
+    ("person_movies", "i"),
+    ("movie_offsets", "q"),
+    ("movie_stars", "i"),
+    ("name_order", "i"),
+    ("reversed_name_order", "i")
+)
+STRING_FIELDS = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years"
+)
+
+class Graph():
+    """
+    Compact person-movie graph.
+
+    People and movies are interned to dense integer indices in sorted id
+    order, with their fields held in parallel columns. The bipartite graph
+    is stored in CSR form on both sides: the movies of person i are
+    person_movies[person_offsets[i]:person_offsets[i + 1]], and the stars
+    of movie j are movie_stars[movie_offsets[j]:movie_offsets[j + 1]].
+    name_order lists person indices sorted by lowercase name, and
+    reversed_name_order sorted by lowercase name spelled backwards.
+
+    Columns may be lists and arrays, or StringColumns and memoryviews
+    over a memory-mapped snapshot.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 person_offsets, person_movies,
+                 movie_ids, movie_titles, movie_years,
+                 movie_offsets, movie_stars, name_order, reversed_name_order):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        self.name_order = name_order
+        self.reversed_name_order = reversed_name_order
+
+    @classmethod
+    def build(cls, people_rows, movie_rows, star_rows):
+        """
+        Build a graph from (id, name, birth), (id, title, year) and
+        (person_id, movie_id) tuples. Stars naming an unknown person
+        or movie are skipped; later rows win for duplicate ids.
+        """
+        people_rows = unique_rows(people_rows)
+        movie_rows = unique_rows(movie_rows)
+        star_people, star_movies = intern_stars(
+            star_rows,
+            {row[0]: i for i, row in enumerate(people_rows)},
+            {row[0]: i for i, row in enumerate(movie_rows)}
+        )
+        return cls.assemble(people_rows, movie_rows, star_people, star_movies)
+
+    @classmethod
+    def assemble(cls, people_rows, movie_rows, star_people, star_movies):
+        """
+        Build a graph from people and movie rows already sorted by unique
+        id, and star pairs already interned to indices into those rows.
+        """
+        person_offsets, person_movies = build_csr(star_people, star_movies, len(people_rows))
+        movie_offsets, movie_stars = build_csr(star_movies, star_people, len(movie_rows))
+        name_order = array("i", sorted(
+            range(len(people_rows)), key=lambda person: people_rows[person][1].lower()
+        ))
+        reversed_name_order = array("i", sorted(
+            range(len(people_rows)), key=lambda person: people_rows[person][1].lower()[::-1]
+        ))
+        return cls(
+            [row[0] for row in people_rows],
+            [row[1] for row in people_rows],
+            share_values(row[2] for row in people_rows),
+            person_offsets, person_movies,
+            [row[0] for row in movie_rows],
+            [row[1] for row in movie_rows],
+            share_values(row[2] for row in movie_rows),
+            movie_offsets, movie_stars, name_order, reversed_name_order
+        )
+
+    def person_index(self, person_id):
+        """
+        Returns the integer index of a person_id, raising KeyError if unknown.
+        """
+        return find_index(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the integer index of a movie_id, raising KeyError if unknown.
+        """
+        return find_index(self.movie_ids, movie_id)
+
+    def movies_of(self, person):
+        """
+        Returns the movie indices a person index starred in.
+        """
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person indices who starred in a movie index.
+        """
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def popularity(self, person):
+        """
+        Returns the number of movies a person index starred in.
+        """
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who
+        starred with a given person index.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        for movie in person_movies[person_offsets[person]:person_offsets[person + 1]]:
+            for star in movie_stars[movie_offsets[movie]:movie_offsets[movie + 1]]:
+                yield movie, star
+
+class People(Mapping):
+    """
+    Read-only view mapping person_ids to a dictionary of:
+    name, birth, movies (a set of movie_ids).
+    """
+
+    def __getitem__(self, person_id):
+        person = graph.person_index(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie] for movie in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(graph.person_ids)
+
+    def __len__(self):
+        return len(graph.person_ids)
+
+class Movies(Mapping):
+    """
+    Read-only view mapping movie_ids to a dictionary of:
+    title, year, stars (a set of person_ids).
+    """
+
+    def __getitem__(self, movie_id):
+        movie = graph.movie_index(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[person] for person in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(graph.movie_ids)
+
+    def __len__(self):
+        return len(graph.movie_ids)
+
+class Names(Mapping):
+    """
+    Read-only view mapping lowercase names to a set of corresponding person_ids.
+    """
+
+    def __getitem__(self, name):
+        order = graph.name_order
+        i = bisect_left(order, name, key=lowercase_name)
+        person_ids = set()
+        while i < len(order) and lowercase_name(order[i]) == name:
+            person_ids.add(graph.person_ids[order[i]])
+            i += 1
+        if not person_ids:
+            raise KeyError(name)
+        return person_ids
+
+    def __iter__(self):
+        previous = None
+        for person in graph.name_order:
+            name = lowercase_name(person)
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+class StringColumn():
+    """
+    Sequence of strings stored as UTF-8 `data` with `offsets` marking
+    where each one starts, decoded on access.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def lowercase_name(person):
+    """
+    Returns the lowercase name of a person index.
+    """
+    return graph.person_names[person].lower()
+
+def reversed_name(person):
+    """
+    Returns the lowercase name of a person index spelled backwards.
+    """
+    return graph.person_names[person].lower()[::-1]
+
+def find_index(ids, key):
+    """
+    Returns the position of `key` in the sorted sequence `ids`,
+    raising KeyError if it is not present.
+    """
+    i = bisect_left(ids, key)
+    if i == len(ids) or ids[i] != key:
+        raise KeyError(key)
+    return i
+
+def unique_rows(rows):
+    """
+    Returns rows sorted by their first column (the id),
+    keeping the last row for each id.
+    """
+    return sorted({row[0]: row for row in rows}.values())
+
+def intern_stars(star_rows, person_index, movie_index):
+    """
+    Returns parallel (star_people, star_movies) index arrays for
+    (person_id, movie_id) rows, skipping ids missing from the indexes.
+    """
+    star_people = array("i")
+    star_movies = array("i")
+    for person_id, movie_id in star_rows:
+        person = person_index.get(person_id)
+        movie = movie_index.get(movie_id)
+        if person is None or movie is None:
+            continue
+        star_people.append(person)
+        star_movies.append(movie)
+    return star_people, star_movies
+
+def share_values(values):
+    """
+    Returns `values` as a list in which equal strings share one object,
+    for low-cardinality columns such as birth and release years.
+    """
+    shared = {}
+    return [shared.setdefault(value, value) for value in values]
+
+def build_csr(sources, targets, size):
+    """
+    Returns CSR (offsets, indices) arrays for the edges
+    sources[k] -> targets[k] over `size` source nodes,
+    with each row sorted and duplicate edges dropped.
+    """
+    # Count edges per source, then prefix-sum into row offsets
+    offsets = array("q", bytes(8 * (size + 1)))
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    # Scatter targets into their rows
+    indices = array("i", bytes(4 * len(sources)))
+    cursor = offsets[:size]
+    for source, target in zip(sources, targets):
+        indices[cursor[source]] = target
+        cursor[source] += 1
+
+    # Sort and deduplicate each row in place
+    start = write = 0
+    for i in range(size):
+        end = offsets[i + 1]
+        row = sorted(set(indices[start:end]))
+        offsets[i] = write
+        indices[write:write + len(row)] = array("i", row)
+        write += len(row)
+        start = end
+    offsets[size] = write
+    del indices[write:]
+    return offsets, indices
+
+# Bytes of stars.csv parsed per task when loading in parallel
+STAR_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Indexes used by star-parsing processes, set by init_star_parser
+star_person_index = None
+star_movie_index = None
+
+# Index entries scanned per name order when looking for similar names
+MAX_FUZZY_CANDIDATES = 500
+
+# Compact person-movie graph built by load_data
+graph = Graph.build([], [], [])
 
 # Maps names to a set of corresponding person_ids
-names = {}
+names = Names()
+
+# Optional landmark distance index built by load_landmarks
+landmarks = None
 
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
-people = {}
+people = People()
 
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
-movies = {}
+movies = Movies()
 
-def load_data(directory):
+def load_data(directory, use_snapshot=True, workers=1):
     """
     Load data from CSV files into memory.
+
+    Unless `use_snapshot` is False, the parsed graph is saved to a binary
+    snapshot next to the CSV files and memory-mapped on later loads for
+    as long as the files' modification times and sizes are unchanged.
+    stars.csv is parsed in chunks, across `workers` processes if more
+    than one. Any landmark index is dropped, since it was built for the
+    previous graph. Returns the number of CSV rows parsed and the seconds
+    it took, or None if the snapshot was used.
     """
+    global graph, landmarks
+    landmarks = None
+
+    path = os.path.join(directory, SNAPSHOT)
+    signature = source_signature(directory)
+    if use_snapshot:
+        graph = read_snapshot(path, signature)
+        if graph is not None:
+            return None
+
+    start = time.perf_counter()
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    people_rows = list(read_columns(f"{directory}/people.csv", ("id", "name", "birth")))
+    rows = len(people_rows)
+    people_rows = unique_rows(people_rows)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+    movie_rows = list(read_columns(f"{directory}/movies.csv", ("id", "title", "year")))
+    rows += len(movie_rows)
+    movie_rows = unique_rows(movie_rows)
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    star_people, star_movies, star_count = read_stars(
+        f"{directory}/stars.csv",
+        {row[0]: i for i, row in enumerate(people_rows)},
+        {row[0]: i for i, row in enumerate(movie_rows)},
+        workers
+    )
+    rows += star_count
+    seconds = time.perf_counter() - start
+
+    graph = Graph.assemble(people_rows, movie_rows, star_people, star_movies)
+
+    if use_snapshot:
+        try:
+            write_snapshot(graph, path, signature)
+        except OSError:
+            pass
+    return rows, seconds
+
+def read_columns(path, columns):
+    """
+    Yields a tuple of the named columns for each row of a CSV file.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(column) for column in columns]
         for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+            yield tuple(row[position] for position in positions)
 
-def person_id_for_name(name):
+def read_stars(path, person_index, movie_index, workers):
+    """
+    Returns (star_people, star_movies, rows) for stars.csv: the interned
+    star pairs and the number of rows parsed. The file is split into
+    line-aligned byte ranges that are parsed in order, in a process pool
+    when `workers` is more than one.
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        positions = (header.index("person_id"), header.index("movie_id"))
+        tasks = [(path, start, end, positions) for start, end in chunk_ranges(f, STAR_CHUNK_SIZE)]
+
+    if workers > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(workers, initializer=init_star_parser,
+                                  initargs=(person_index, movie_index)) as pool:
+            return merge_star_chunks(pool.imap(parse_star_chunk, tasks))
+    init_star_parser(person_index, movie_index)
+    return merge_star_chunks(map(parse_star_chunk, tasks))
+
+def merge_star_chunks(chunks):
+    """
+    Concatenates parse_star_chunk results as they arrive.
+    """
+    star_people = array("i")
+    star_movies = array("i")
+    rows = 0
+    for chunk_people, chunk_movies, chunk_rows in chunks:
+        star_people.extend(chunk_people)
+        star_movies.extend(chunk_movies)
+        rows += chunk_rows
+    return star_people, star_movies, rows
+
+def chunk_ranges(f, size):
+    """
+    Returns (start, end) byte ranges of roughly `size` bytes covering
+    binary file `f` from its current position, each ending on a line break.
+    """
+    start = f.tell()
+    f.seek(0, os.SEEK_END)
+    end_of_file = f.tell()
+    ranges = []
+    while start < end_of_file:
+        f.seek(min(start + size, end_of_file))
+        f.readline()
+        end = f.tell()
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def init_star_parser(person_index, movie_index):
+    """
+    Set the id indexes parse_star_chunk interns star rows against.
+    """
+    global star_person_index, star_movie_index
+    star_person_index = person_index
+    star_movie_index = movie_index
+
+def parse_star_chunk(task):
+    """
+    Parses one (path, start, end, positions) byte range of stars.csv,
+    returning its interned (star_people, star_movies) arrays and row count.
+    """
+    path, start, end, (person_column, movie_column) = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).decode("utf-8").splitlines()
+    star_rows = [
+        (row[person_column], row[movie_column])
+        for row in csv.reader(lines) if row
+    ]
+    star_people, star_movies = intern_stars(star_rows, star_person_index, star_movie_index)
+    return star_people, star_movies, len(star_rows)
+
+def source_signature(directory):
+    """
+    Returns the (mtime, size) pairs of the dataset's CSV files,
+    used to tell whether a snapshot is still current.
+    """
+    signature = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        signature.extend((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def write_snapshot(graph, path, signature):
+    """
+    Write `graph` to a binary snapshot at `path`: a header with the
+    format version and source signature, a table of (offset, length)
+    pairs, then each section aligned to 8 bytes.
+    """
+    sections = [getattr(graph, field).tobytes() for field, _ in ARRAY_FIELDS]
+    for field in STRING_FIELDS:
+        offsets = array("q", [0])
+        data = bytearray()
+        for value in getattr(graph, field):
+            data += value.encode("utf-8")
+            offsets.append(len(data))
+        sections.extend((offsets.tobytes(), data))
+
+    table = array("q")
+    position = align(SNAPSHOT_HEADER.size + 16 * len(sections))
+    for section in sections:
+        table.extend((position, len(section)))
+        position = align(position + len(section))
+
+    # Write to a temporary file first so readers never see a partial snapshot
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, *signature))
+        f.write(table.tobytes())
+        for offset, section in zip(table[::2], sections):
+            f.write(bytes(offset - f.tell()))
+            f.write(section)
+    os.replace(temporary, path)
+
+def read_snapshot(path, signature):
+    """
+    Returns a Graph backed by a memory-mapped snapshot at `path`,
+    or None if it is missing, truncated or corrupt, from another format
+    version, or was built from different source files.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(data) < SNAPSHOT_HEADER.size:
+        return None
+    magic, version, *stored = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or tuple(stored) != signature:
+        return None
+
+    # A truncated or corrupt snapshot is rebuilt rather than trusted
+    view = memoryview(data)
+    count = len(ARRAY_FIELDS) + 2 * len(STRING_FIELDS)
+    try:
+        table = struct.unpack_from(f"<{2 * count}q", data, SNAPSHOT_HEADER.size)
+        pairs = list(zip(table[::2], table[1::2]))
+        if any(offset < 0 or length < 0 or offset + length > len(data) for offset, length in pairs):
+            return None
+        sections = [view[offset:offset + length] for offset, length in pairs]
+
+        fields = {}
+        for (field, typecode), section in zip(ARRAY_FIELDS, sections):
+            fields[field] = section.cast(typecode)
+        strings = sections[len(ARRAY_FIELDS):]
+        for field, offsets, data in zip(STRING_FIELDS, strings[::2], strings[1::2]):
+            offsets = offsets.cast("q")
+            if len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(data):
+                return None
+            fields[field] = StringColumn(offsets, data)
+    except (struct.error, TypeError, ValueError):
+        return None
+    return Graph(**fields)
+
+def align(position):
+    """
+    Rounds a file position up to a multiple of 8 bytes.
+    """
+    return (position + 7) & ~7
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    A trailing birth year, as in "Emma Watson (1990)", narrows the
+    candidates. Remaining ambiguities are asked about when `interactive`,
+    and otherwise resolved to the person with the most movies.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = candidates_for_name(name)
     if len(person_ids) == 0:
         return None
-    elif len(person_ids) > 1:
+    elif len(person_ids) > 1 and interactive:
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -74,63 +617,643 @@ def person_id_for_name(name):
     else:
         return person_ids[0]
 
+def candidates_for_name(name):
+    """
+    Returns the person_ids a query could refer to, most movies first:
+    the person_id itself if `name` is one, otherwise every person with
+    that name and, if one is given in parentheses, that birth year.
+    """
+    if name in people:
+        return [name]
+    birth = None
+    match = re.fullmatch(r"(.*?)\s*\((\d{4})\)", name)
+    if match is not None:
+        name, birth = match.groups()
+    person_ids = names.get(name.lower(), set())
+    if birth is not None:
+        person_ids = {person_id for person_id in person_ids if people[person_id]["birth"] == birth}
+    return sorted(
+        person_ids,
+        key=lambda person_id: -graph.popularity(graph.person_index(person_id))
+    )
+
+def people_with_prefix(prefix, limit=10):
+    """
+    Returns up to `limit` person_ids whose name starts with
+    `prefix` (ignoring case), in name order.
+    """
+    prefix = prefix.lower()
+    order = graph.name_order
+    i = bisect_left(order, prefix, key=lowercase_name)
+    person_ids = []
+    while i < len(order) and len(person_ids) < limit:
+        if not lowercase_name(order[i]).startswith(prefix):
+            break
+        person_ids.append(graph.person_ids[order[i]])
+        i += 1
+    return person_ids
+
+def similar_names(name, max_distance=2, limit=5):
+    """
+    Returns up to `limit` names within `max_distance` edits of `name`,
+    closest first.
+
+    Candidates are names sharing the first half of `name` as a prefix or
+    its second half as a suffix, taken from a window of each name order
+    around where `name` itself would sort. Every name one edit away that
+    falls inside a window is found, and names further away are found
+    when their edits fall in a single half.
+    """
+    name = name.lower()
+    half = len(name) // 2
+    distances = {}
+    searches = (
+        (graph.name_order, lowercase_name, name, name[:max(half, 1)]),
+        (graph.reversed_name_order, reversed_name, name[::-1], name[::-1][:max(len(name) - half, 1)])
+    )
+    for order, key, target, prefix in searches:
+        i = bisect_left(order, target, key=key)
+        start = max(i - MAX_FUZZY_CANDIDATES // 2, 0)
+        for person in order[start:start + MAX_FUZZY_CANDIDATES]:
+            candidate = key(person)
+            if candidate.startswith(prefix):
+                candidate = lowercase_name(person)
+                if candidate not in distances:
+                    distances[candidate] = (edit_distance(name, candidate, max_distance), person)
+
+    matches = sorted(
+        (distance, -graph.popularity(person), graph.person_names[person])
+        for distance, person in distances.values()
+        if distance <= max_distance
+    )
+    return [match[2] for match in matches[:limit]]
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between strings a and b,
+    or limit + 1 once it is known to exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, a_char in enumerate(a, 1):
+        current = [i]
+        for j, b_char in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (a_char != b_char)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
-    neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
-    return neighbors
+    return {
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in graph.neighbors(graph.person_index(person_id))
+    }
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=True):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
     If no possible path, returns None.
+
+    By default the search expands from both ends and meets in the middle;
+    pass bidirectional=False for a single-ended breadth-first search.
     """
-    # Initialize the frontier with the starting position
-    frontier = deque([(source, [])])
-    explored = set()
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    if bidirectional and landmarks is not None:
+        path = landmark_search(source, target)
+    elif bidirectional:
+        path = bidirectional_search(source, target)
+    else:
+        path = breadth_first_search(source, target)
+    if path is None:
+        return None
+    return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+def breadth_first_search(source, target):
+    """
+    Returns the shortest list of (movie, person) index pairs connecting
+    the source index to the target index, searching from the source only.
+    If no possible path, returns None.
+    """
+    if source == target:
+        return []
+
+    # Map each reached person to the (movie, person) step that reached them
+    parents = {source: None}
+    frontier = deque([source])
 
     while frontier:
-        current_person, path = frontier.popleft()
+        current_person = frontier.popleft()
+
+        # Add unreached neighbors to the frontier
+        for movie, person in graph.neighbors(current_person):
+            if person in parents:
+                continue
+            parents[person] = (movie, current_person)
+            if person == target:
+                return trace_path(parents, target)
+            frontier.append(person)
+
+    return None
+
+def bidirectional_search(source, target, limit=None):
+    """
+    Returns the shortest list of (movie, person) index pairs connecting
+    the source index to the target index, searching breadth-first from
+    both people at once and always growing the smaller frontier.
+    If no possible path, or none shorter than `limit` steps, returns None.
+    """
+    if source == target:
+        return []
 
-        # Mark the person as explored
-        explored.add(current_person)
+    # Map each reached person to the (movie, person) step leading
+    # back towards the side's starting person
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+    depth = 0
 
-        # Add neighbors to the frontier
-        for movie_id, person_id in neighbors_for_person(current_person):
-            if person_id == target:
-                return path + [(movie_id, person_id)]
-            if person_id not in explored and person_id not in [p for _, p in frontier]:
-                frontier.append((person_id, path + [(movie_id, person_id)]))
+    while forward_frontier and backward_frontier:
+        # Another level could only find a path of depth + 1 steps
+        if limit is not None and depth + 1 >= limit:
+            return None
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_frontier(forward_frontier, forward, backward)
+        else:
+            backward_frontier, meeting = expand_frontier(backward_frontier, backward, forward)
+        depth += 1
+        if meeting is not None:
+            return join_paths(forward, backward, meeting)
 
     return None
 
-def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python degrees.py [directory]")
+def landmark_search(source, target):
+    """
+    Returns the same result as bidirectional_search, using the landmark
+    index to rule out unconnected pairs, to answer directly when the
+    landmark bounds meet, and otherwise to stop the search once it can
+    no longer beat the path through the best landmark.
+    """
+    lower, upper, via = landmarks.bounds(source, target)
+    if lower == math.inf:
+        return None
+    if upper is None:
+        return bidirectional_search(source, target)
+    if lower == upper:
+        return landmarks.path_through(source, target, via)
+    path = bidirectional_search(source, target, limit=upper)
+    if path is None:
+        path = landmarks.path_through(source, target, via)
+    return path
+
+def expand_frontier(frontier, parents, other_parents):
+    """
+    Expands one full level of a breadth-first frontier, recording parent
+    steps in `parents`. Returns the next frontier and the first person
+    also reached by the opposite search (or None).
+    """
+    next_frontier = []
+    for current_person in frontier:
+        for movie, person in graph.neighbors(current_person):
+            if person in parents:
+                continue
+            parents[person] = (movie, current_person)
+            if person in other_parents:
+                return next_frontier, person
+            next_frontier.append(person)
+    return next_frontier, None
+
+def trace_path(parents, person):
+    """
+    Returns the list of (movie, person) steps leading from the root
+    of a parent map to `person`.
+    """
+    path = []
+    while parents[person] is not None:
+        movie, previous = parents[person]
+        path.append((movie, person))
+        person = previous
+    path.reverse()
+    return path
+
+def join_paths(forward, backward, meeting):
+    """
+    Builds the source-to-target path through the `meeting` person
+    from the forward and backward parent maps.
+    """
+    path = trace_path(forward, meeting)
+    person = meeting
+    while backward[person] is not None:
+        movie, following = backward[person]
+        path.append((movie, following))
+        person = following
+    return path
+
+class LandmarkIndex():
+    """
+    Distance oracle over the people graph: breadth-first distances from
+    a few landmark people, one byte per person per landmark. By the
+    triangle inequality these bound the degrees between any two people.
+    """
+
+    def __init__(self, landmarks, distances, build_seconds=None):
+        self.landmarks = landmarks
+        self.distances = distances
+        self.build_seconds = build_seconds
+
+    @classmethod
+    def build(cls, graph, count):
+        """
+        Build an index over the `count` people with the most movies.
+        """
+        start = time.perf_counter()
+        size = len(graph.person_ids)
+        chosen = array("i", heapq.nlargest(count, range(size), key=graph.popularity))
+        distances = []
+        for landmark in chosen:
+            # Breadth-first search over the whole graph from the landmark
+            reached = array("B", [UNREACHABLE]) * size
+            reached[landmark] = 0
+            frontier = [landmark]
+            depth = 0
+            while frontier and depth + 1 < UNREACHABLE:
+                depth += 1
+                next_frontier = []
+                for current_person in frontier:
+                    for _, person in graph.neighbors(current_person):
+                        if reached[person] == UNREACHABLE:
+                            reached[person] = depth
+                            next_frontier.append(person)
+                frontier = next_frontier
+            distances.append(reached)
+        return cls(chosen, distances, time.perf_counter() - start)
+
+    @classmethod
+    def read(cls, path, signature, count):
+        """
+        Returns the index saved at `path`, or None if it is missing, has
+        a different number of landmarks, or was built from other data.
+        """
+        try:
+            with open(path, "rb") as f:
+                header = f.read(SNAPSHOT_HEADER.size + 16)
+                if len(header) < SNAPSHOT_HEADER.size + 16:
+                    return None
+                magic, version, *stored = SNAPSHOT_HEADER.unpack_from(header)
+                stored_count, size = struct.unpack_from("<2q", header, SNAPSHOT_HEADER.size)
+                if (magic != LANDMARKS_MAGIC or version != LANDMARKS_VERSION
+                        or tuple(stored) != signature or stored_count != count
+                        or size != len(graph.person_ids)):
+                    return None
+                chosen = array("i")
+                chosen.fromfile(f, count)
+                distances = []
+                for _ in range(count):
+                    reached = array("B")
+                    reached.fromfile(f, size)
+                    distances.append(reached)
+        except (OSError, EOFError):
+            return None
+        return cls(chosen, distances)
+
+    def write(self, path, signature):
+        """
+        Save the index to `path`, tagged with the dataset's signature.
+        """
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(LANDMARKS_MAGIC, LANDMARKS_VERSION, *signature))
+            f.write(struct.pack("<2q", len(self.landmarks), len(graph.person_ids)))
+            self.landmarks.tofile(f)
+            for reached in self.distances:
+                reached.tofile(f)
+        os.replace(temporary, path)
+
+    def size(self):
+        """
+        Returns the number of bytes used by the landmark distances.
+        """
+        return sum(len(reached) for reached in self.distances) + 4 * len(self.landmarks)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper, via) bounds on the degrees between two
+        person indices, where the upper bound is the path through the
+        landmark at position `via`. lower is math.inf if a landmark
+        reaches only one of them; upper and via are None if no landmark
+        reaches either.
+        """
+        lower = 0
+        upper = via = None
+        for i, reached in enumerate(self.distances):
+            to_source = reached[source]
+            to_target = reached[target]
+            if to_source == UNREACHABLE and to_target == UNREACHABLE:
+                continue
+            if to_source == UNREACHABLE or to_target == UNREACHABLE:
+                return math.inf, None, None
+            lower = max(lower, abs(to_source - to_target))
+            if upper is None or to_source + to_target < upper:
+                upper = to_source + to_target
+                via = i
+        return lower, upper, via
 
-    directory = sys.argv[1]
+    def path_through(self, source, target, via):
+        """
+        Returns a list of (movie, person) index pairs from source to
+        target through the landmark at position `via`.
+        """
+        reached = self.distances[via]
+        path = self.descend(source, reached)
+        from_target = self.descend(target, reached)
+        people_on_way = [target] + [person for _, person in from_target]
+        for i in reversed(range(len(from_target))):
+            path.append((from_target[i][0], people_on_way[i]))
+        return path
+
+    def descend(self, person, reached):
+        """
+        Returns (movie, person) steps from a person index down to a
+        landmark, following strictly decreasing landmark distances.
+        """
+        steps = []
+        while reached[person] > 0:
+            for movie, neighbor in graph.neighbors(person):
+                if reached[neighbor] == reached[person] - 1:
+                    steps.append((movie, neighbor))
+                    person = neighbor
+                    break
+        return steps
+
+def load_landmarks(directory, count):
+    """
+    Load the landmark index for the dataset in `directory`, building it
+    over `count` landmarks and saving it if no current one is saved.
+    """
+    global landmarks
 
-    # Load data from files into memory
-    print("Loading data...")
+    path = os.path.join(directory, LANDMARKS)
+    signature = source_signature(directory)
+    landmarks = LandmarkIndex.read(path, signature, count)
+    if landmarks is None:
+        landmarks = LandmarkIndex.build(graph, count)
+        try:
+            landmarks.write(path, signature)
+        except OSError:
+            pass
+    return landmarks
+
+def distance_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two person_ids from the landmark index, without searching.
+    upper is None when no landmark reaches them, and lower is math.inf
+    when they are known not to be connected. Raises ValueError if no
+    landmark index is loaded.
+    """
+    if landmarks is None:
+        raise ValueError("No landmark index is loaded.")
+    lower, upper, _ = landmarks.bounds(graph.person_index(source), graph.person_index(target))
+    return lower, upper
+
+def load_worker(directory, landmark_count):
+    """
+    Initialize a query process: load the snapshot and, if
+    `landmark_count` is set, the saved landmark index.
+    """
     load_data(directory)
-    print("Data loaded.")
+    if landmark_count:
+        load_landmarks(directory, landmark_count)
+
+def resolve_pair(pair):
+    """
+    Returns (result, person_ids) for a (source_name, target_name) pair:
+    the start of a JSON-serializable result, with ambiguous names listed
+    under "ambiguous", and the chosen person_ids, or None in their place
+    if a name matched nobody and the result holds the error.
+    """
+    source_name, target_name = pair
+    result = {"source": source_name, "target": target_name}
+
+    person_ids = []
+    for name in (source_name, target_name):
+        candidates = candidates_for_name(name)
+        if len(candidates) == 0:
+            result["error"] = f"{name} not found."
+            result["suggestions"] = similar_names(name)
+            return result, None
+        if len(candidates) > 1:
+            result.setdefault("ambiguous", {})[name] = candidates
+        person_ids.append(candidates[0])
+    return result, person_ids
+
+def answer_query(pair):
+    """
+    Returns a JSON-serializable result for a (source_name, target_name)
+    pair, resolving names without prompting: ambiguous names go to the
+    person with the most movies and are listed under "ambiguous", and
+    missing names are reported as an error with similar names suggested.
+    """
+    result, person_ids = resolve_pair(pair)
+    if person_ids is None:
+        return result
+
+    path = shortest_path(*person_ids)
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {
+                "movie_id": movie_id,
+                "title": movies[movie_id]["title"],
+                "person_id": person_id,
+                "name": people[person_id]["name"]
+            }
+            for movie_id, person_id in path
+        ]
+    return result
+
+def answer_distance(pair):
+    """
+    Returns a JSON-serializable result for a (source_name, target_name)
+    pair with the landmark index's bounds on their degrees of separation,
+    resolving names as answer_query does. "lower" is None and "connected"
+    false when they are known not to be connected; "upper" is None when
+    no landmark reaches them.
+    """
+    result, person_ids = resolve_pair(pair)
+    if person_ids is None:
+        return result
+
+    lower, upper = distance_bounds(*person_ids)
+    result["connected"] = lower != math.inf
+    result["lower"] = None if lower == math.inf else lower
+    result["upper"] = upper
+    return result
+
+def read_pairs(f):
+    """
+    Yields (source_name, target_name) pairs from the first two
+    columns of a CSV file, skipping blank lines.
+    """
+    for row in csv.reader(f):
+        if len(row) >= 2:
+            yield row[0].strip(), row[1].strip()
+
+def run_batch(directory, f, workers, landmark_count=None):
+    """
+    Answer every name pair in file `f`, writing one JSON result
+    per line to standard output in input order.
+    """
+    pairs = read_pairs(f)
+    if workers > 1:
+        # Workers load the snapshot written by the parent, so start-up is cheap
+        with multiprocessing.Pool(workers, initializer=load_worker,
+                                  initargs=(directory, landmark_count)) as pool:
+            for result in pool.imap(answer_query, pairs, chunksize=64):
+                print(json.dumps(result), flush=True)
+    else:
+        for result in map(answer_query, pairs):
+            print(json.dumps(result), flush=True)
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /?source=NAME&target=NAME with answer_query's JSON result,
+    and GET /distance?source=NAME&target=NAME with answer_distance's.
+    """
+
+    # Process pool shared by all request threads, or None to answer in-thread
+    pool = None
+
+    # Whether a landmark index was loaded, which /distance needs
+    has_landmarks = False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        answer = answer_distance if url.path == "/distance" else answer_query
+        if "source" not in query or "target" not in query:
+            self.send_json(400, {"error": "source and target are required."})
+            return
+        if answer is answer_distance and not self.has_landmarks:
+            self.send_json(400, {"error": "No landmark index is loaded; start the server with --landmarks."})
+            return
+        pair = (query["source"][0], query["target"][0])
+        if self.pool is not None:
+            result = self.pool.apply(answer, (pair,))
+        else:
+            result = answer(pair)
+        self.send_json(200, result)
+
+    def send_json(self, status, result):
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(directory, port, workers, landmark_count=None):
+    """
+    Keep the graph loaded and answer queries over HTTP on `port`,
+    one thread per connection, until interrupted.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), QueryHandler)
+    QueryHandler.has_landmarks = bool(landmark_count)
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=load_worker,
+                                    initargs=(directory, landmark_count))
+        QueryHandler.pool = pool
+    print(f"Serving on http://127.0.0.1:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if pool is not None:
+            pool.terminate()
+
+def not_found_message(name):
+    """
+    Returns the message for a name that matched nobody,
+    suggesting similar names if there are any.
+    """
+    suggestions = similar_names(name)
+    if not suggestions:
+        return f"{name} not found."
+    return f"{name} not found. Did you mean: {', '.join(suggestions)}?"
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the degrees of separation between two people.")
+    parser.add_argument("directory")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--batch", metavar="FILE",
+                      help="answer source,target name pairs from a CSV file ('-' for stdin)")
+    mode.add_argument("--serve", metavar="PORT", type=int,
+                      help="answer queries over HTTP on PORT")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes parsing the CSV files and answering batch or server queries")
+    parser.add_argument("--landmarks", metavar="K", type=int,
+                        help="build or load a distance index over K landmark people")
+    args = parser.parse_args()
+
+    directory = args.directory
+
+    # Load data from files into memory, keeping batch output pure JSON
+    log = sys.stderr if args.batch is not None else sys.stdout
+    print("Loading data...", file=log)
+    stats = load_data(directory, workers=args.workers)
+    if stats is not None:
+        rows, seconds = stats
+        print(f"Parsed {rows:,} rows in {seconds:.2f}s ({rows / seconds:,.0f} rows/sec).", file=log)
+    print("Data loaded.", file=log)
+
+    if args.landmarks:
+        start = time.perf_counter()
+        load_landmarks(directory, args.landmarks)
+        if landmarks.build_seconds is None:
+            action = f"loaded in {time.perf_counter() - start:.2f}s"
+        else:
+            action = f"built in {landmarks.build_seconds:.2f}s"
+        print(f"Landmark index: {args.landmarks} landmarks, "
+              f"{landmarks.size():,} bytes, {action}.", file=log)
+
+    if args.batch == "-":
+        run_batch(directory, sys.stdin, args.workers, args.landmarks)
+        return
+    if args.batch is not None:
+        with open(args.batch, encoding="utf-8", newline="") as f:
+            run_batch(directory, f, args.workers, args.landmarks)
+        return
+    if args.serve is not None:
+        serve(directory, args.serve, args.workers, args.landmarks)
+        return
 
     source_name = input("Name: ")
     source = person_id_for_name(source_name)
     if source is None:
-        sys.exit(f"{source_name} not found.")
+        sys.exit(not_found_message(source_name))
 
     target_name = input("Name: ")
     target = person_id_for_name(target_name)
     if target is None:
-        sys.exit(f"{target_name} not found.")
+        sys.exit(not_found_message(target_name))
 
     path = shortest_path(source, target)
 
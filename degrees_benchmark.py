@@ -0,0 +1,109 @@
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+
+import degrees
+
+PEOPLE = 4000
+STARS_PER_MOVIE = 4
+QUERIES = 20
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python degrees_benchmark.py [people]")
+    num_people = int(sys.argv[1]) if len(sys.argv) == 2 else PEOPLE
+    num_movies = max(1, num_people // 2)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Generating synthetic graph ({num_people} people, {num_movies} movies)...")
+        write_synthetic_data(directory, num_people, num_movies, STARS_PER_MOVIE)
+        start = time.perf_counter()
+        degrees.load_data(directory)
+        print(f"Data loaded in {time.perf_counter() - start:.2f}s.")
+
+    rng = random.Random(1)
+    person_ids = [str(i) for i in range(num_people)]
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(QUERIES)]
+
+    searches = [
+        ("list-scan BFS (before)", list_scan_shortest_path),
+        ("parent-map BFS", lambda s, t: degrees.shortest_path(s, t, bidirectional=False)),
+        ("bidirectional BFS", degrees.shortest_path),
+    ]
+    for label, search in searches:
+        nodes, seconds = run_queries(search, pairs)
+        print(f"{label:>24}: {nodes} nodes in {seconds:.3f}s "
+              f"({nodes / seconds:,.0f} nodes/sec)")
+
+def write_synthetic_data(directory, num_people, num_movies, stars_per_movie):
+    """
+    Write people.csv, movies.csv and stars.csv for a random graph
+    into `directory`.
+    """
+    rng = random.Random(0)
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(num_people):
+            writer.writerow([i, f"Person {i}", 1900 + i % 100])
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(num_movies):
+            writer.writerow([i, f"Movie {i}", 1950 + i % 70])
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for i in range(num_movies):
+            for person in rng.sample(range(num_people), stars_per_movie):
+                writer.writerow([person, i])
+
+def run_queries(search, pairs):
+    """
+    Run `search` over every pair, returning the number of people expanded
+    and the total elapsed time.
+    """
+    expanded = 0
+    graph = degrees.graph
+    neighbors = graph.neighbors
+
+    def counting_neighbors(person):
+        nonlocal expanded
+        expanded += 1
+        return neighbors(person)
+
+    graph.neighbors = counting_neighbors
+    try:
+        start = time.perf_counter()
+        for source, target in pairs:
+            search(source, target)
+        seconds = time.perf_counter() - start
+    finally:
+        del graph.neighbors
+    return expanded, seconds
+
+def list_scan_shortest_path(source, target):
+    """
+    The original search: rescans the frontier for every neighbor
+    and copies the path for every enqueued person.
+    """
+    frontier = deque([(source, [])])
+    explored = set()
+
+    while frontier:
+        current_person, path = frontier.popleft()
+        explored.add(current_person)
+        for movie_id, person_id in degrees.neighbors_for_person(current_person):
+            if person_id == target:
+                return path + [(movie_id, person_id)]
+            if person_id not in explored and person_id not in [p for _, p in frontier]:
+                frontier.append((person_id, path + [(movie_id, person_id)]))
+
+    return None
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,16 @@
+import argparse
 import csv
-import itertools
+import json
+import math
+import multiprocessing
+import os
 import sys
+import time
+import heapq
+import itertools
+from functools import lru_cache
+
+import numpy as np
 
 PROBS = {
     "gene": {
@@ -25,6 +35,20 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Assignments scored per call when enumerating with NumPy arrays
+BATCH_SIZE = 65536
+
+# Sampling defaults: total samples kept, Gibbs chains, the fraction of
+# each chain discarded as burn-in, and the batches each chain is split
+# into to estimate standard errors
+SAMPLES = 10000
+CHAINS = 4
+BURN_IN = 0.1
+BATCHES = 20
+
+# Fewest effective samples a sampling standard error is estimated from
+MIN_EFFECTIVE_SAMPLES = 10
+
 def load_data(filename):
     """
     Load gene and trait data from a file into a dictionary.
@@ -48,86 +72,58 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Yield every subset of set s, one at a time, without building a list.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    for r in range(len(s) + 1):
+        for subset in itertools.combinations(s, r):
+            yield set(subset)
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def gene_count(person, one_gene, two_genes):
     """
-    Compute and return a joint probability.
+    Return how many copies of the gene `person` has in an assignment.
     """
-    probability = 1
-
-    for person in people:
-        genes = (
-            2 if person in two_genes else
-            1 if person in one_gene else
-            0
-        )
+    return (
+        2 if person in two_genes else
+        1 if person in one_gene else
+        0
+    )
 
-        mother = people[person]["mother"]
-        father = people[person]["father"]
+def gene_probability(people, person, one_gene, two_genes):
+    """
+    Return the probability of `person` having their number of copies of
+    the gene, given their parents' copies if their parents are known.
+    """
+    genes = gene_count(person, one_gene, two_genes)
+    mother = people[person]["mother"]
+    father = people[person]["father"]
 
-        # Probability of gene
-        if mother is None and father is None:
-            probability *= PROBS["gene"][genes]
-        else:
-            # Probability from parents
-            mother_genes = (
-                2 if mother in two_genes else
-                1 if mother in one_gene else
-                0
-            )
-            father_genes = (
-                2 if father in two_genes else
-                1 if father in one_gene else
-                0
-            )
+    if mother is None and father is None:
+        return PROBS["gene"][genes]
 
-            # Probabilities of passing the gene
-            pass_from_mother = (
-                1 - PROBS["mutation"] if mother_genes == 2 else
-                0.5 if mother_genes == 1 else
-                PROBS["mutation"]
-            )
-            pass_from_father = (
-                1 - PROBS["mutation"] if father_genes == 2 else
-                0.5 if father_genes == 1 else
-                PROBS["mutation"]
-            )
+    # Probability from parents
+    mother_genes = gene_count(mother, one_gene, two_genes)
+    father_genes = gene_count(father, one_gene, two_genes)
 
-            if genes == 2:
-                probability *= pass_from_mother * pass_from_father
-            elif genes == 1:
-                probability *= (pass_from_mother * (1 - pass_from_father) +
-                                (1 - pass_from_mother) * pass_from_father)
-            else:
-                probability *= (1 - pass_from_mother) * (1 - pass_from_father)
+    # Probabilities of passing the gene
+    pass_from_mother = (
+        1 - PROBS["mutation"] if mother_genes == 2 else
+        0.5 if mother_genes == 1 else
+        PROBS["mutation"]
+    )
+    pass_from_father = (
+        1 - PROBS["mutation"] if father_genes == 2 else
+        0.5 if father_genes == 1 else
+        PROBS["mutation"]
+    )
 
-        # Probability of trait
-        probability *= PROBS["trait"][genes][person in have_trait]
-
-    return probability
-
-def update(probabilities, one_gene, two_genes, have_trait, p):
-    """
-    Add to `probabilities` a new joint probability `p`.
-    Each person should have their "gene" and "trait" distributions updated.
-    Which value to update depends on whether they are in `one_gene`, `two_genes`, and `have_trait`.
-    """
-    for person in probabilities:
-        genes = (
-            2 if person in two_genes else
-            1 if person in one_gene else
-            0
-        )
-        probabilities[person]["gene"][genes] += p
-        probabilities[person]["trait"][person in have_trait] += p
+    if genes == 2:
+        return pass_from_mother * pass_from_father
+    elif genes == 1:
+        return (pass_from_mother * (1 - pass_from_father) +
+                (1 - pass_from_mother) * pass_from_father)
+    else:
+        return (1 - pass_from_mother) * (1 - pass_from_father)
 
 def normalize(probabilities):
     """
@@ -140,14 +136,11 @@ def normalize(probabilities):
             for value in probabilities[person][field]:
                 probabilities[person][field][value] /= total
 
-def main():
-
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
-
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+def empty_probabilities(people):
+    """
+    Return a gene and trait distribution of all zeros for each person.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -162,31 +155,762 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
+def enumerate_probabilities(people):
+    """
+    Return the normalized gene and trait distributions for each person
+    by summing the joint probability of every gene assignment. Known
+    traits are fixed rather than enumerated, and unknown traits are
+    summed out exactly from each person's own gene count, so only the
+    3^N gene assignments are visited, one at a time.
+    """
+    probabilities = empty_probabilities(people)
     names = set(people)
-    for have_trait in powerset(names):
+    observed = {person for person in names if people[person]["trait"] is not None}
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
+    # Loop over all sets of people who might have one copy of the gene
+    for one_gene in powerset(names):
 
-        # Loop over all sets of people who might have one copy of the gene
-        for one_gene in powerset(names - have_trait):
+        # Loop over all sets of people who might have two copies of the gene
+        for two_genes in powerset(names - one_gene):
 
-            # Loop over all sets of people who might have two copies of the gene
-            for two_genes in powerset(names - have_trait - one_gene):
+            # Probability of the genes and of every known trait
+            p = 1
+            for person in names:
+                p *= gene_probability(people, person, one_gene, two_genes)
+            for person in observed:
+                genes = gene_count(person, one_gene, two_genes)
+                p *= PROBS["trait"][genes][people[person]["trait"]]
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+            # An unknown trait splits p by its probability given the genes
+            for person in names:
+                genes = gene_count(person, one_gene, two_genes)
+                probabilities[person]["gene"][genes] += p
+                if person in observed:
+                    probabilities[person]["trait"][people[person]["trait"]] += p
+                else:
+                    for value in (True, False):
+                        probabilities[person]["trait"][value] += p * PROBS["trait"][genes][value]
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
+    return probabilities
+
+@lru_cache(maxsize=None)
+def probability_tables():
+    """
+    Return PROBS as arrays indexed by gene count: the prior, the
+    inheritance table whose [child, mother, father] entry is the
+    probability of a child having `child` copies of the gene given the
+    parents' copies, and the trait table indexed by [genes, trait].
+    """
+    prior = np.array([PROBS["gene"][genes] for genes in range(3)])
+    passes = np.array([
+        PROBS["mutation"],
+        0.5,
+        1 - PROBS["mutation"]
+    ])
+    from_mother = passes[:, None]
+    from_father = passes[None, :]
+    inheritance = np.array([
+        (1 - from_mother) * (1 - from_father),
+        from_mother * (1 - from_father) + (1 - from_mother) * from_father,
+        from_mother * from_father
+    ])
+    trait = np.array([
+        [PROBS["trait"][genes][False], PROBS["trait"][genes][True]]
+        for genes in range(3)
+    ])
+    return prior, inheritance, trait
+
+def family_arrays(people):
+    """
+    Return (names, mothers, fathers, traits) for a family as arrays in
+    the order of `people`: each person's parents as indexes into names,
+    -1 for founders, and their trait as 1 or 0 if known, -1 otherwise.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    mothers = np.array([index.get(people[name]["mother"], -1) for name in names], dtype=np.intp)
+    fathers = np.array([index.get(people[name]["father"], -1) for name in names], dtype=np.intp)
+    traits = np.array(
+        [-1 if people[name]["trait"] is None else int(people[name]["trait"]) for name in names],
+        dtype=np.int8
+    )
+    return names, mothers, fathers, traits
+
+def joint_probabilities(mothers, fathers, genes, traits):
+    """
+    Compute and return the joint probability of each assignment in a
+    batch, where row k of `genes` and `traits` gives everyone's gene
+    count and trait in assignment k.
+    """
+    prior, inheritance, trait = probability_tables()
+    founders = mothers < 0
+    children = ~founders
+    probability = prior[genes[:, founders]].prod(axis=1)
+    probability *= inheritance[
+        genes[:, children],
+        genes[:, mothers[children]],
+        genes[:, fathers[children]]
+    ].prod(axis=1)
+    probability *= trait[genes, traits].prod(axis=1)
+    return probability
+
+def accumulate(gene_totals, trait_totals, genes, traits, p):
+    """
+    Add the joint probabilities `p` of a batch of assignments to each
+    person's gene totals (indexed by [person, genes]) and trait totals
+    (indexed by [person, trait]).
+    """
+    for count in range(3):
+        gene_totals[:, count] += p @ (genes == count)
+    trait_present = p @ (traits == 1)
+    trait_totals[:, 1] += trait_present
+    trait_totals[:, 0] += p.sum() - trait_present
+
+def batch_probabilities(people):
+    """
+    Return the normalized gene and trait distributions for each person
+    by scoring every assignment consistent with the evidence, a batch
+    at a time. Takes time exponential in the number of people.
+    """
+    names, mothers, fathers, observed = family_arrays(people)
+    unknown = np.flatnonzero(observed < 0)
+    gene_totals = np.zeros((len(names), 3))
+    trait_totals = np.zeros((len(names), 2))
+
+    # Assignment k has gene counts from its base-3 digits and, above
+    # those, the unknown traits from its binary digits
+    gene_places = 3 ** np.arange(len(names), dtype=np.int64)
+    trait_places = 2 ** np.arange(len(unknown), dtype=np.int64)
+    assignments = 3 ** len(names) * 2 ** len(unknown)
+    for start in range(0, assignments, BATCH_SIZE):
+        k = np.arange(start, min(start + BATCH_SIZE, assignments), dtype=np.int64)
+        genes = (k[:, None] // gene_places) % 3
+        traits = np.repeat(observed[None, :], len(k), axis=0)
+        traits[:, unknown] = (k[:, None] // 3 ** len(names) // trait_places) % 2
+        p = joint_probabilities(mothers, fathers, genes, traits)
+        accumulate(gene_totals, trait_totals, genes, traits, p)
+
+    gene_totals /= gene_totals.sum(axis=1, keepdims=True)
+    trait_totals /= trait_totals.sum(axis=1, keepdims=True)
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(names):
+        for count in range(3):
+            probabilities[person]["gene"][count] = float(gene_totals[i, count])
+        for value in (True, False):
+            probabilities[person]["trait"][value] = float(trait_totals[i, int(value)])
+    return probabilities
+
+def gene_factors(people):
+    """
+    Return the factors of the family's Bayesian network over gene counts,
+    as (scope, table) pairs: each person's gene distribution given their
+    parents, times the likelihood of their trait if it is known.
+    """
+    prior, inheritance, trait = probability_tables()
+    factors = []
+    for person, row in people.items():
+        if row["mother"] is None:
+            scope, table = (person,), prior
+        else:
+            scope, table = (person, row["mother"], row["father"]), inheritance
+        if row["trait"] is not None:
+            likelihood = trait[:, int(row["trait"])]
+            table = table * likelihood.reshape((3,) + (1,) * (len(scope) - 1))
+        factors.append((scope, table))
+    return factors
+
+def family_graph(people):
+    """
+    Return the moralized family graph as a dict from each person to the
+    set of their parents, children and partners.
+    """
+    neighbors = {person: set() for person in people}
+    for person, row in people.items():
+        if row["mother"] is not None:
+            family = (person, row["mother"], row["father"])
+            for a, b in itertools.combinations(family, 2):
+                neighbors[a].add(b)
+                neighbors[b].add(a)
+    return neighbors
+
+def elimination_order(people):
+    """
+    Return an order in which to eliminate everyone's gene variable, chosen
+    greedily to add the fewest edges to the moralized family graph (ties
+    broken by fewest neighbors), which keeps the cliques small.
+    """
+    neighbors = family_graph(people)
+
+    def cost(person):
+        fill = sum(
+            1 for a, b in itertools.combinations(neighbors[person], 2)
+            if b not in neighbors[a]
+        )
+        return fill, len(neighbors[person])
+
+    # Heap of (fill, degree, index, person), where an entry is stale once
+    # the person's cost has changed or they have been eliminated
+    costs = {person: cost(person) for person in people}
+    heap = [(*costs[person], i, person) for i, person in enumerate(people)]
+    heapq.heapify(heap)
+    index = {person: i for i, person in enumerate(people)}
+
+    order = []
+    while heap:
+        *person_cost, _, person = heapq.heappop(heap)
+        if costs.get(person) != tuple(person_cost):
+            continue
+        del costs[person]
+        order.append(person)
+
+        family = neighbors.pop(person)
+        for a, b in itertools.combinations(family, 2):
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+        for neighbor in family:
+            neighbors[neighbor].discard(person)
+
+        # Only the eliminated person's neighbors, and theirs, change cost
+        changed = set(family)
+        for neighbor in family:
+            changed.update(neighbors[neighbor])
+        for other in changed:
+            costs[other] = cost(other)
+            heapq.heappush(heap, (*costs[other], index[other], other))
+    return order
+
+def contract(operands, scope):
+    """
+    Multiply (scope, table) factors together and sum out every variable
+    not in `scope`, returning the resulting table normalized to sum to 1.
+    """
+    labels = {}
+    arguments = []
+    for factor_scope, table in operands:
+        arguments.append(table)
+        arguments.append([labels.setdefault(variable, len(labels)) for variable in factor_scope])
+    arguments.append([labels[variable] for variable in scope])
+    table = np.einsum(*arguments)
+    return table / table.sum()
+
+def eliminate_probabilities(people):
+    """
+    Return the normalized gene and trait distributions for each person
+    by exact inference on the family's Bayesian network: variable
+    elimination builds a clique tree, and passing messages up and back
+    down it gives every person's gene distribution. Takes time linear in
+    the number of people and exponential only in the tree width.
+    """
+    order = elimination_order(people)
+    position = {person: i for i, person in enumerate(order)}
+
+    # Each factor belongs to the clique of its first eliminated variable
+    assigned = [[] for _ in order]
+    for scope, table in gene_factors(people):
+        assigned[min(position[variable] for variable in scope)].append((scope, table))
+
+    # Upward pass: eliminating each variable in turn gives its clique and
+    # the message it sends on to the clique of the next variable in scope
+    scopes = [None] * len(order)
+    potentials = [None] * len(order)
+    upward = [None] * len(order)
+    children = [[] for _ in order]
+    for i, person in enumerate(order):
+        scope = {person}
+        for factor_scope, _ in assigned[i]:
+            scope.update(factor_scope)
+        for child in children[i]:
+            scope.update(upward[child][0])
+        scopes[i] = tuple(sorted(scope, key=position.get))
+
+        # A clique may contain variables none of its own factors mention
+        ones = (scopes[i], np.ones((3,) * len(scopes[i])))
+        potentials[i] = (scopes[i], contract([ones] + assigned[i], scopes[i]))
+        message_scope = scopes[i][1:]
+        upward[i] = (
+            message_scope,
+            contract([potentials[i]] + [upward[child] for child in children[i]], message_scope)
+        )
+        if message_scope:
+            children[position[message_scope[0]]].append(i)
+
+    # Downward pass: each clique combines its potential with every other
+    # message it received to send a message back to each child
+    downward = [None] * len(order)
+    probabilities = empty_probabilities(people)
+    for i in reversed(range(len(order))):
+        incoming = [upward[child] for child in children[i]]
+        if downward[i] is not None:
+            incoming.append(downward[i])
+        for k, child in enumerate(children[i]):
+            others = incoming[:k] + incoming[k + 1:]
+            message_scope = upward[child][0]
+            downward[child] = (message_scope, contract([potentials[i]] + others, message_scope))
+
+        person = order[i]
+        genes = contract([potentials[i]] + incoming, (person,))
+        for count in range(3):
+            probabilities[person]["gene"][count] = float(genes[count])
+
+    # Trait distributions follow from each person's gene distribution
+    for person, row in people.items():
+        if row["trait"] is not None:
+            trait = 1.0 if row["trait"] else 0.0
+        else:
+            trait = sum(
+                probabilities[person]["gene"][genes] * PROBS["trait"][genes][True]
+                for genes in range(3)
+            )
+        probabilities[person]["trait"][True] = trait
+        probabilities[person]["trait"][False] = 1 - trait
+    return probabilities
+
+def topological_order(mothers, fathers):
+    """
+    Return the indexes of everyone in a family with each person's
+    parents before them.
+    """
+    order = []
+    placed = np.zeros(len(mothers), dtype=bool)
+    for person in range(len(mothers)):
+        stack = [person]
+        while stack:
+            current = stack[-1]
+            if placed[current]:
+                stack.pop()
+                continue
+            parents = [parent for parent in (mothers[current], fathers[current])
+                       if parent >= 0 and not placed[parent]]
+            if parents:
+                stack.extend(parents)
+            else:
+                placed[current] = True
+                order.append(current)
+                stack.pop()
+    return np.array(order, dtype=np.intp)
+
+def sampled_probabilities(people, names, genes, traits):
+    """
+    Return gene and trait distributions in the format of `normalize`
+    from arrays of estimated gene distributions (indexed by [person,
+    genes]) and probabilities of having the trait.
+    """
+    probabilities = empty_probabilities(people)
+    for i, person in enumerate(names):
+        for count in range(3):
+            probabilities[person]["gene"][count] = float(genes[i, count])
+        probabilities[person]["trait"][True] = float(traits[i])
+        probabilities[person]["trait"][False] = 1 - float(traits[i])
+    return probabilities
+
+def trait_estimates(genes, observed):
+    """
+    Return each person's probability of having the trait: their known
+    trait, or else the expectation over their estimated gene counts.
+    """
+    _, _, trait = probability_tables()
+    return np.where(observed >= 0, observed, genes @ trait[:, 1])
+
+def likelihood_weighting_task(task):
+    """
+    Draw `samples` gene assignments forward from the founders and weight
+    each by the likelihood of the observed traits. Returns weighted sums,
+    relative to the largest log weight, for merging with other tasks.
+    """
+    mothers, fathers, observed, order, samples, seed = task
+    prior, inheritance, trait = probability_tables()
+    rng = np.random.default_rng(seed)
+    known = observed >= 0
+
+    genes = np.empty((samples, len(mothers)), dtype=np.intp)
+    for person in order:
+        if mothers[person] < 0:
+            distribution = np.broadcast_to(prior, (samples, 3))
+        else:
+            distribution = inheritance[:, genes[:, mothers[person]], genes[:, fathers[person]]].T
+        cumulative = distribution.cumsum(axis=1)
+        draws = rng.random(samples)[:, None] * cumulative[:, 2:]
+        genes[:, person] = (draws > cumulative[:, :2]).sum(axis=1)
+
+    log_weights = np.log(trait[genes[:, known], observed[known]]).sum(axis=1)
+    scale = log_weights.max()
+    weights = np.exp(log_weights - scale)
+    squared = weights ** 2
+    one_hot = genes[:, :, None] == np.arange(3)
+    return (
+        scale,
+        weights.sum(),
+        squared.sum(),
+        np.einsum("s,spg->pg", weights, one_hot),
+        np.einsum("s,spg->pg", squared, one_hot),
+    )
+
+def likelihood_weighting(people, samples=SAMPLES, workers=1, seed=0):
+    """
+    Return approximate gene and trait distributions for each person by
+    likelihood-weighted sampling, split across `workers` processes, and
+    a dict of statistics: the effective sample size of the weights and
+    the largest standard error of any gene probability, which is
+    math.inf when there are fewer than MIN_EFFECTIVE_SAMPLES effective
+    samples to estimate it from.
+    """
+    if samples < 1:
+        raise ValueError("likelihood weighting needs at least one sample")
+    names, mothers, fathers, observed = family_arrays(people)
+    order = topological_order(mothers, fathers)
+
+    # Every task draws at least one sample
+    workers = max(1, min(workers, samples))
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    tasks = [
+        (mothers, fathers, observed, order, samples // workers + (k < samples % workers), seeds[k])
+        for k in range(workers)
+    ]
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(likelihood_weighting_task, tasks)
+    else:
+        results = [likelihood_weighting_task(task) for task in tasks]
+
+    # Rescale every task's sums to the largest log weight of any task
+    scale = max(result[0] for result in results)
+    total = squared = 0
+    gene_sums = gene_squared_sums = 0
+    for task_scale, task_total, task_squared, task_genes, task_genes_squared in results:
+        factor = np.exp(task_scale - scale)
+        total = total + factor * task_total
+        squared = squared + factor ** 2 * task_squared
+        gene_sums = gene_sums + factor * task_genes
+        gene_squared_sums = gene_squared_sums + factor ** 2 * task_genes_squared
+
+    # The standard error of a weighted proportion behaves like that of
+    # an unweighted one over the effective samples; with too few of
+    # those it cannot be estimated at all
+    genes = gene_sums / total
+    effective = float(total ** 2 / squared)
+    if effective < MIN_EFFECTIVE_SAMPLES:
+        standard_error = math.inf
+    else:
+        standard_error = float(np.sqrt(genes * (1 - genes) / effective).max())
+    statistics = {
+        "effective_samples": effective,
+        "standard_error": standard_error,
+    }
+    traits = trait_estimates(genes, observed)
+    return sampled_probabilities(people, names, genes, traits), statistics
+
+def gibbs_plan(people, names, mothers, fathers):
+    """
+    Return the groups of people a Gibbs sweep updates together: no two
+    people in a group are parent, child or partner, so each group can be
+    resampled at once. Each group is (members, edges), where edges lists
+    every (member position, child, other parent, member is mother).
+    """
+    index = {name: i for i, name in enumerate(names)}
+    colors = {}
+    for person, neighbors in sorted(family_graph(people).items(), key=lambda item: -len(item[1])):
+        taken = {colors[neighbor] for neighbor in neighbors if neighbor in colors}
+        colors[person] = next(color for color in itertools.count() if color not in taken)
+
+    groups = []
+    for color in range(max(colors.values()) + 1):
+        members = np.array([index[person] for person in names if colors[person] == color], dtype=np.intp)
+        position = {member: k for k, member in enumerate(members)}
+        edges = [
+            (position[mothers[child]], child, fathers[child], True)
+            for child in range(len(names)) if mothers[child] in position
+        ] + [
+            (position[fathers[child]], child, mothers[child], False)
+            for child in range(len(names)) if fathers[child] in position
+        ]
+        edges = np.array(edges, dtype=np.intp).reshape(-1, 4)
+        groups.append((members, edges))
+    return groups
+
+def gibbs_chain(task):
+    """
+    Run one Gibbs chain for `sweeps` sweeps after burn-in. Returns the
+    sums, per batch of sweeps, of every person's conditional gene
+    distribution, and the sums of their squares over all sweeps.
+    """
+    mothers, fathers, observed, order, groups, sweeps, burn_in, seed = task
+    prior, inheritance, trait = probability_tables()
+    log_prior, log_inheritance = np.log(prior), np.log(inheritance)
+    rng = np.random.default_rng(seed)
+
+    # Observed traits enter as a log likelihood for each gene count
+    evidence = np.zeros((len(mothers), 3))
+    known = observed >= 0
+    evidence[known] = np.log(trait[:, observed[known]].T)
+
+    # Start from a forward sample from the founders
+    genes = np.empty(len(mothers), dtype=np.intp)
+    for person in order:
+        if mothers[person] < 0:
+            distribution = prior
+        else:
+            distribution = inheritance[:, genes[mothers[person]], genes[fathers[person]]]
+        genes[person] = rng.choice(3, p=distribution)
+
+    batch_sums = np.zeros((BATCHES, len(mothers), 3))
+    squared_sums = np.zeros((len(mothers), 3))
+    batch_length = max(1, sweeps // BATCHES)
+    for sweep in range(burn_in + sweeps):
+        for members, edges in groups:
+            member_mothers, member_fathers = mothers[members], fathers[members]
+            founders = member_mothers < 0
+            log_p = np.empty((len(members), 3))
+            log_p[founders] = log_prior
+            log_p[~founders] = log_inheritance[
+                :, genes[member_mothers[~founders]], genes[member_fathers[~founders]]
+            ].T
+            log_p += evidence[members]
+
+            # Each child contributes its own probability given the member
+            positions, children, others, is_mother = edges.T
+            is_mother = is_mother.astype(bool)
+            contributions = np.empty((len(children), 3))
+            contributions[is_mother] = log_inheritance[
+                genes[children[is_mother]], :, genes[others[is_mother]]
+            ]
+            contributions[~is_mother] = log_inheritance[
+                genes[children[~is_mother]], genes[others[~is_mother]], :
+            ]
+            np.add.at(log_p, positions, contributions)
+
+            p = np.exp(log_p - log_p.max(axis=1, keepdims=True))
+            p /= p.sum(axis=1, keepdims=True)
+            cumulative = p.cumsum(axis=1)
+            genes[members] = (rng.random(len(members))[:, None] > cumulative[:, :2]).sum(axis=1)
+
+            # Average the conditional distributions rather than the draws
+            if sweep >= burn_in:
+                batch = min((sweep - burn_in) // batch_length, BATCHES - 1)
+                batch_sums[batch, members] += p
+                squared_sums[members] += p ** 2
+    return batch_sums, squared_sums
+
+def gibbs_sampling(people, samples=SAMPLES, chains=CHAINS, workers=1, seed=0):
+    """
+    Return approximate gene and trait distributions for each person by
+    Gibbs sampling `chains` chains for `samples` sweeps in total, run on
+    `workers` processes, and a dict of statistics: the smallest effective
+    sample size and the largest standard error of any gene probability,
+    both estimated from batch means.
+    """
+    names, mothers, fathers, observed = family_arrays(people)
+    order = topological_order(mothers, fathers)
+    groups = gibbs_plan(people, names, mothers, fathers)
+    sweeps = max(BATCHES, samples // chains)
+    burn_in = int(sweeps * BURN_IN)
+    seeds = np.random.SeedSequence(seed).spawn(chains)
+    tasks = [(mothers, fathers, observed, order, groups, sweeps, burn_in, chain_seed) for chain_seed in seeds]
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(gibbs_chain, tasks)
+    else:
+        results = [gibbs_chain(task) for task in tasks]
+
+    # Every chain's batches are the units for the batch-means estimates
+    batch_length = sweeps // BATCHES
+    batch_means = np.concatenate([batch_sums for batch_sums, _ in results]) / batch_length
+    batch_means[BATCHES - 1::BATCHES] *= batch_length / (sweeps - batch_length * (BATCHES - 1))
+    total = chains * sweeps
+    genes = sum(batch_sums.sum(axis=0) for batch_sums, _ in results) / total
+    variance = sum(squared_sums for _, squared_sums in results) / total - genes ** 2
+    standard_error = batch_means.std(axis=0, ddof=1) / np.sqrt(len(batch_means))
+
+    # Probabilities that barely vary say nothing about mixing
+    varying = (variance > 1e-12) & (standard_error > 0)
+    effective = variance[varying] / standard_error[varying] ** 2
+    statistics = {
+        "effective_samples": float(min(effective.min(), total)) if varying.any() else float(total),
+        "standard_error": float(standard_error.max()),
+    }
+    traits = trait_estimates(genes, observed)
+    return sampled_probabilities(people, names, genes, traits), statistics
+
+# Ways of computing the gene and trait distributions, by --method name
+METHODS = {
+    "batch": batch_probabilities,
+    "eliminate": eliminate_probabilities,
+    "enumerate": enumerate_probabilities,
+}
+
+# Approximate methods, which also report sampling statistics
+SAMPLERS = {
+    "gibbs": gibbs_sampling,
+    "likelihood": likelihood_weighting,
+}
+
+def family_paths(path):
+    """
+    Return the family CSV files named by `path`: every .csv file in it
+    if it is a directory, otherwise the paths listed one per line in it
+    as a manifest (relative to the manifest, skipping blank lines and
+    lines starting with #).
+    """
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith(".csv")
+        )
+    directory = os.path.dirname(path)
+    with open(path) as f:
+        lines = (line.strip() for line in f)
+        return [os.path.join(directory, line) for line in lines if line and not line.startswith("#")]
+
+# How a batch worker process infers each family, set by init_family_worker
+family_method = None
+family_options = {}
+
+def init_family_worker(method, options):
+    """
+    Initialize a batch process: remember how to infer each family and
+    build the probability tables once, up front.
+    """
+    global family_method, family_options
+    family_method = method
+    family_options = options
+    probability_tables()
+
+def infer_family(path):
+    """
+    Returns (path, probabilities, seconds, error) for one family file,
+    with the time taken to load and infer it, or an error message in
+    place of the probabilities if the file could not be used.
+    """
+    start = time.perf_counter()
+    try:
+        people = load_data(path)
+        if family_method in SAMPLERS:
+            probabilities, _ = SAMPLERS[family_method](people, **family_options)
+        else:
+            probabilities = METHODS[family_method](people)
+    except (OSError, KeyError, ValueError) as e:
+        return path, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return path, probabilities, time.perf_counter() - start, None
+
+def write_family_csv(writer, path, probabilities, seconds, error):
+    """
+    Write one row per person of a family to a CSV writer, or a single
+    row with the error if the family failed.
+    """
+    if error is not None:
+        writer.writerow([path, "", "", "", "", "", "", f"{seconds:.6f}", error])
+        return
+    for person, distributions in probabilities.items():
+        writer.writerow(
+            [path, person]
+            + [f"{distributions['gene'][genes]:.6f}" for genes in (2, 1, 0)]
+            + [f"{distributions['trait'][value]:.6f}" for value in (True, False)]
+            + [f"{seconds:.6f}", ""]
+        )
+
+def family_json(path, probabilities, seconds, error):
+    """
+    Return a JSON-serializable result for one family.
+    """
+    result = {"family": path, "seconds": seconds}
+    if error is not None:
+        result["error"] = error
+    else:
+        result["people"] = {
+            person: {
+                "gene": {str(genes): p for genes, p in distributions["gene"].items()},
+                "trait": {str(value).lower(): p for value, p in distributions["trait"].items()},
+            }
+            for person, distributions in probabilities.items()
+        }
+    return result
+
+def run_batch(paths, output, output_format, method, options, workers):
+    """
+    Infer every family in `paths`, streaming results to the file object
+    `output` in input order as CSV rows or JSON lines.
+    """
+    if output_format == "csv":
+        writer = csv.writer(output)
+        writer.writerow([
+            "family", "person", "gene_2", "gene_1", "gene_0",
+            "trait_true", "trait_false", "seconds", "error"
+        ])
+
+    def write(result):
+        if output_format == "csv":
+            write_family_csv(writer, *result)
+        else:
+            output.write(json.dumps(family_json(*result)) + "\n")
+        output.flush()
+
+    if workers > 1:
+        with multiprocessing.Pool(workers, initializer=init_family_worker,
+                                  initargs=(method, options)) as pool:
+            for result in pool.imap(infer_family, paths, chunksize=16):
+                write(result)
+    else:
+        init_family_worker(method, options)
+        for result in map(infer_family, paths):
+            write(result)
+
+def main():
+    parser = argparse.ArgumentParser(description="Infer gene and trait probabilities for a family.")
+    parser.add_argument("data")
+    parser.add_argument("--method", choices=sorted(METHODS) + sorted(SAMPLERS), default="eliminate",
+                        help="exact variable elimination, enumeration of every "
+                             "assignment for small families (one at a time or in "
+                             "NumPy batches), or approximate sampling for very "
+                             "large families (default: eliminate)")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help=f"samples to draw when sampling (default: {SAMPLES})")
+    parser.add_argument("--chains", type=int, default=CHAINS,
+                        help=f"independent Gibbs chains (default: {CHAINS})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to sample on, or to infer families on with --batch (default: 1)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="random seed for sampling (default: 0)")
+    parser.add_argument("--batch", action="store_true",
+                        help="treat DATA as a directory of family CSV files, or a manifest "
+                             "listing one per line, and infer every family")
+    parser.add_argument("--output", metavar="FILE", default="-",
+                        help="where to write batch results (default: standard output)")
+    parser.add_argument("--format", choices=["csv", "json"],
+                        help="batch output format: CSV rows or JSON lines "
+                             "(default: from the output file extension, else csv)")
+    args = parser.parse_args()
+    if args.samples < 1 or args.chains < 1 or args.workers < 1:
+        parser.error("--samples, --chains and --workers must be at least 1")
+
+    if args.batch:
+        options = {}
+        if args.method in SAMPLERS:
+            options = {"samples": args.samples, "seed": args.seed}
+            if args.method == "gibbs":
+                options["chains"] = args.chains
+        output_format = args.format or ("json" if args.output.endswith((".json", ".jsonl")) else "csv")
+        paths = family_paths(args.data)
+        if args.output == "-":
+            run_batch(paths, sys.stdout, output_format, args.method, options, args.workers)
+        else:
+            with open(args.output, "w", newline="") as output:
+                run_batch(paths, output, output_format, args.method, options, args.workers)
+        return
+
+    people = load_data(args.data)
+
+    statistics = None
+    if args.method == "gibbs":
+        probabilities, statistics = gibbs_sampling(
+            people, args.samples, args.chains, args.workers, args.seed
+        )
+    elif args.method in SAMPLERS:
+        probabilities, statistics = SAMPLERS[args.method](
+            people, args.samples, args.workers, args.seed
+        )
+    else:
+        probabilities = METHODS[args.method](people)
 
     # Print results
     for person in people:
@@ -196,7 +920,12 @@ def main():
             for value in probabilities[person][field]:
                 p = probabilities[person][field][value]
                 print(f"    {value}: {p:.4f}")
+    if statistics is not None:
+        print(f"Effective sample size: {statistics['effective_samples']:.0f}")
+        if math.isinf(statistics["standard_error"]):
+            print("Largest standard error: undefined (too few effective samples)")
+        else:
+            print(f"Largest standard error: {statistics['standard_error']:.4f}")
 
 if __name__ == "__main__":
     main()
-
@@ -1,101 +1,706 @@
+import argparse
+import json
+import math
 import os
 import re
-import sys
-import random
+import struct
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 
 DAMPING = 0.85
 SAMPLES = 10000
+TOLERANCE = 0.001
+WALKERS = 1000
+
+# Steps each sampling walker takes before its visits count: enough for
+# the influence of its uniform random start to decay below MIXING_ERROR
+MIXING_ERROR = 0.001
+MAX_BURN_IN = 1000
+GAUSS_SEIDEL_BLOCKS = 64
+EXTRAPOLATION_INTERVAL = 10
+
+# Per-file link cache kept in the corpus directory, one JSON array per line
+LINK_CACHE = ".pagerank-links.jsonl"
+LINK_PATTERN = re.compile(r'<a\s+(?:[^>]*?\s+)?href="([^"]*)"')
+READ_SIZE = 64 * 1024
+CRAWL_BATCH = 256
+
+# Binary edge file for out-of-core ranking: a header, then (source, target)
+# int32 pairs sorted by source; page names are kept in a ".pages" sidecar
+EDGE_MAGIC = b"PRLINKS\0"
+EDGE_VERSION = 1
+EDGE_HEADER = struct.Struct("<8sI4xqq")
+EDGE_BLOCK = 1 << 22
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
+    parser = argparse.ArgumentParser(description="Rank the pages of a corpus.")
+    parser.add_argument("corpus")
+    parser.add_argument("--ranks", metavar="FILE",
+                        help="warm-start iteration from ranks saved in FILE, then save the new ranks there")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="power",
+                        help="iterative solver (default: power)")
+    parser.add_argument("--damping", type=float, default=DAMPING,
+                        help=f"damping factor (default: {DAMPING})")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"stop iterating once no rank changes by this much (default: {TOLERANCE})")
+    parser.add_argument("--report", action="store_true",
+                        help="print the residual and time of every sweep")
+    parser.add_argument("--edge-file", metavar="PATH",
+                        help="rank out of core from a memory-mapped edge file at PATH, "
+                             "built from the corpus when missing or stale (skips sampling)")
+    parser.add_argument("--personalize", metavar="FILE",
+                        help="also print personalized PageRank for each entry of a JSON file "
+                             "mapping a name to a list of pages or a {page: weight} object")
+    args = parser.parse_args()
 
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
+    previous = read_ranks(args.ranks) if args.ranks else None
+    if args.edge_file:
+        if args.solver != "power":
+            parser.error("--edge-file only supports the power solver")
+        if args.personalize:
+            parser.error("--edge-file does not support --personalize")
+        cache_path = update_link_cache(args.corpus)
+        if (not os.path.exists(args.edge_file)
+                or os.path.getmtime(cache_path) > os.path.getmtime(args.edge_file)):
+            build_edge_file(cache_path, args.edge_file)
+
+        # Start timing here so the report covers only the solver's sweeps
+        convergence = Convergence()
+        ranks = iterate_pagerank_edges(args.edge_file, args.damping, args.tolerance,
+                                       initial=previous, convergence=convergence)
+    else:
+        corpus = crawl(args.corpus)
+        ranks = sample_pagerank(corpus, args.damping, SAMPLES)
+        print(f"PageRank Results from Sampling (n = {SAMPLES})")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
 
-    ranks = iterate_pagerank(corpus, DAMPING)
+        convergence = Convergence()
+        ranks = iterate_pagerank(corpus, args.damping, args.tolerance, initial=previous,
+                                 solver=args.solver, convergence=convergence)
     print("PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    if args.ranks:
+        write_ranks(args.ranks, ranks)
 
-def crawl(directory):
-    pages = dict()
-
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = set()
-            for link in re.findall(r'href="(.*?)"', contents):
-                if link.startswith("#"):
-                    continue
-                if link.startswith("mailto:"):
-                    continue
-                links.add(link)
-            pages[filename] = set(links) - {filename}
+    if args.personalize:
+        with open(args.personalize, encoding="utf-8") as f:
+            seeds = json.load(f)
+        personalized = personalized_pagerank(corpus, args.damping, seeds, args.tolerance)
+        for name, ranks in personalized.items():
+            print(f"Personalized PageRank Results for {name}")
+            for page in sorted(ranks):
+                print(f"  {page}: {ranks[page]:.4f}")
+
+    if args.report:
+        print(f"Solver: {args.solver}, {len(convergence.residuals)} sweeps "
+              f"in {convergence.elapsed():.4f}s")
+        for sweep, (residual, seconds) in enumerate(zip(convergence.residuals, convergence.times), 1):
+            print(f"  {sweep}: residual {residual:.3e} at {seconds:.4f}s")
+
+def crawl(directory, workers=None):
+    """
+    Parse a directory of HTML pages and check for links to other pages.
+    Return a dictionary where each key is a page, and values are
+    a set of all other pages in the corpus that are linked to by the page.
+
+    Files are parsed concurrently on up to `workers` threads. Their links
+    are cached in the directory and reused while a file's modification
+    time and size are unchanged.
+    """
+    try:
+        entries = [
+            (filename, links)
+            for filename, _, _, links in read_link_cache(update_link_cache(directory, workers))
+        ]
+    except OSError:
+        # Without a writable cache, parse every file directly
+        filenames = sorted(html_files(directory))
+        paths = [os.path.join(directory, filename) for filename in filenames]
+        with ThreadPoolExecutor(workers) as executor:
+            entries = list(zip(filenames, executor.map(parse_links, paths)))
 
+    pages = {filename: set(links) - {filename} for filename, links in entries}
     for filename in pages:
         pages[filename] = {link for link in pages[filename] if link in pages}
 
     return pages
 
-def transition_model(corpus, page, damping_factor):
-    distribution = {}
-    pages = corpus.keys()
-    num_pages = len(pages)
+def html_files(directory):
+    """
+    Returns {filename: (mtime_ns, size)} for the HTML files in `directory`.
+    """
+    files = {}
+    with os.scandir(directory) as scan:
+        for entry in scan:
+            if entry.name.endswith(".html") and entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+def update_link_cache(directory, workers=None):
+    """
+    Bring the link cache in `directory` up to date and return its path.
+
+    Only new and changed files are parsed, CRAWL_BATCH at a time in
+    filename order on up to `workers` threads. Lines for unchanged files
+    are copied from the old cache, so memory use grows with the number
+    of files but not with the number of links.
+    """
+    path = os.path.join(directory, LINK_CACHE)
+    files = html_files(directory)
+
+    # Index the old cache: where each file's line starts, and what it was parsed from
+    cached = {}
+    try:
+        with open(path, "rb") as f:
+            offset = 0
+            for line in f:
+                filename, mtime, size, _ = json.loads(line)
+                cached[filename] = (mtime, size, offset)
+                offset += len(line)
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        cached = {}
+
+    def is_current(filename):
+        return filename in cached and cached[filename][:2] == files[filename]
+
+    if len(cached) == len(files) and all(map(is_current, files)):
+        return path
+
+    temporary = f"{path}.tmp"
+    filenames = sorted(files)
+    with open(temporary, "wb") as out, ThreadPoolExecutor(workers) as executor:
+        old = open(path, "rb") if cached else None
+        try:
+            for start in range(0, len(filenames), CRAWL_BATCH):
+                batch = filenames[start:start + CRAWL_BATCH]
+                stale = [filename for filename in batch if not is_current(filename)]
+                paths = [os.path.join(directory, filename) for filename in stale]
+                parsed = dict(zip(stale, executor.map(parse_links, paths)))
+                for filename in batch:
+                    if filename in parsed:
+                        mtime, size = files[filename]
+                        line = json.dumps([filename, mtime, size, sorted(parsed[filename])]) + "\n"
+                        out.write(line.encode("utf-8"))
+                    else:
+                        old.seek(cached[filename][2])
+                        out.write(old.readline())
+        finally:
+            if old is not None:
+                old.close()
+    os.replace(temporary, path)
+    return path
+
+def parse_links(path):
+    """
+    Returns the set of links in an HTML file, skipping fragment and
+    mailto: links. The file is read in blocks rather than all at once.
+    """
+    links = set()
+    carry = ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(READ_SIZE)
+            text = carry + block
+
+            # Leave a tag that may continue into the next block for later
+            cut = text.rfind("<") if block else len(text)
+            if cut == -1:
+                cut = len(text)
+            for link in LINK_PATTERN.findall(text, 0, cut):
+                if link.startswith("#") or link.startswith("mailto:"):
+                    continue
+                links.add(link)
+            carry = text[cut:]
+            if not block:
+                return links
+
+def read_link_cache(path):
+    """
+    Yields (filename, mtime_ns, size, links) for each file in a
+    link cache, in filename order.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+def build_edge_file(cache_path, path):
+    """
+    Write the link graph in a link cache to a binary edge file at
+    `path`, streaming one page at a time. Pages are numbered in filename
+    order and their names written to `path`.pages, one JSON string per
+    line, so only the name index is held in memory.
+    """
+    index = {filename: i for i, (filename, _, _, _) in enumerate(read_link_cache(cache_path))}
+    with open(f"{path}.pages", "w", encoding="utf-8") as f:
+        for filename in index:
+            f.write(json.dumps(filename) + "\n")
+
+    temporary = f"{path}.tmp"
+    num_edges = 0
+    with open(temporary, "wb") as f:
+        f.write(EDGE_HEADER.pack(EDGE_MAGIC, EDGE_VERSION, len(index), 0))
+        buffer = []
+        for source, (filename, _, _, links) in enumerate(read_link_cache(cache_path)):
+            for target in sorted({index[link] for link in links if link in index and link != filename}):
+                buffer.extend((source, target))
+            if len(buffer) >= 2 * EDGE_BLOCK:
+                np.array(buffer, dtype=np.int32).tofile(f)
+                num_edges += len(buffer) // 2
+                buffer = []
+        np.array(buffer, dtype=np.int32).tofile(f)
+        num_edges += len(buffer) // 2
+        f.seek(0)
+        f.write(EDGE_HEADER.pack(EDGE_MAGIC, EDGE_VERSION, len(index), num_edges))
+    os.replace(temporary, path)
+
+class LinkGraph():
+    """
+    Corpus as a sparse link matrix. Pages are numbered in sorted order and
+    links are stored in CSR form: page i links to the pages
+    targets[offsets[i]:offsets[i + 1]]. The same links grouped by target
+    are kept too: page i is linked from in_sources[in_offsets[i]:in_offsets[i + 1]].
+    """
+
+    def __init__(self, corpus):
+        self.pages = sorted(corpus)
+        num_pages = len(self.pages)
+        index = {page: i for i, page in enumerate(self.pages)}
+        self.out_degree = np.array([len(corpus[page]) for page in self.pages], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.out_degree)))
+        self.targets = np.array(
+            [index[link] for page in self.pages for link in sorted(corpus[page])],
+            dtype=np.int64
+        )
+        self.sources = np.repeat(np.arange(num_pages), self.out_degree)
+        self.dangling = self.out_degree == 0
+        self.link_weight = np.divide(
+            1, self.out_degree, out=np.zeros(num_pages), where=~self.dangling
+        )
+
+        order = np.argsort(self.targets, kind="stable")
+        self.in_sources = self.sources[order]
+        self.in_targets = self.targets[order]
+        self.in_offsets = np.concatenate(([0], np.cumsum(np.bincount(self.targets, minlength=num_pages))))
+
+        # Scatter bins for rank matrices, built by spread when first needed
+        self.column_bins = None
+
+    def step(self, ranks, damping_factor, teleport=None):
+        """
+        Returns the ranks after one power-iteration sweep from `ranks`.
+
+        Random jumps, and the rank of pages with no links, go to every
+        page evenly, or by the `teleport` distribution if given. `ranks`
+        may be a matrix with one rank vector per column, in which case
+        `teleport` is a matrix of the same shape.
+        """
+        num_pages = len(self.pages)
+        if teleport is None:
+            teleport = 1 / num_pages
+        spread = self.spread(ranks)
+        dangling = ranks[self.dangling].sum(axis=0)
+        return (1 - damping_factor) * teleport + damping_factor * (spread + dangling * teleport)
+
+    def spread(self, ranks):
+        """
+        Returns the rank each page receives along links from `ranks`, a
+        vector or a matrix with one rank vector per column. Every column
+        is scattered in the same single pass over the links.
+        """
+        num_pages = len(self.pages)
+        if ranks.ndim == 1:
+            return np.bincount(
+                self.targets, weights=(ranks * self.link_weight)[self.sources], minlength=num_pages
+            )
+
+        # Link (source, target) adds to bin target * columns + column for
+        # every column, so one bincount fills the whole row-major matrix.
+        # Taking the links in target order writes the bins in order. They
+        # only depend on the number of columns, so they are kept for the
+        # next sweep
+        columns = ranks.shape[1]
+        if self.column_bins is None or self.column_bins.size != self.in_targets.size * columns:
+            self.column_bins = (self.in_targets[:, None] * columns + np.arange(columns)).ravel()
+        scaled = np.multiply(ranks, self.link_weight[:, None], order="C")
+        weights = np.take(scaled, self.in_sources, axis=0)
+        return np.bincount(
+            self.column_bins, weights=weights.ravel(), minlength=num_pages * columns
+        ).reshape(num_pages, columns)
+
+def transition_model(corpus, page, damping_factor, teleport=None):
+    """
+    Return a probability distribution over which page to visit next,
+    given a current page. Random jumps go to every page evenly, or by
+    the `teleport` distribution ({page: weight}) if given.
+    """
+    pages = sorted(corpus)
+    jump = dict(zip(pages, teleport_vector(pages, teleport).tolist()))
 
     links = corpus[page]
     num_links = len(links)
 
     if num_links == 0:
-        for p in pages:
-            distribution[p] = 1 / num_pages
-    else:
-        for p in pages:
-            distribution[p] = (1 - damping_factor) / num_pages
-            if p in links:
-                distribution[p] += damping_factor / num_links
+        return jump
+
+    distribution = {}
+    for p in pages:
+        distribution[p] = (1 - damping_factor) * jump[p]
+        if p in links:
+            distribution[p] += damping_factor / num_links
 
     return distribution
 
-def sample_pagerank(corpus, damping_factor, n):
-    pagerank = {page: 0 for page in corpus}
-    sample = random.choice(list(corpus.keys()))
+def teleport_vector(pages, teleport=None):
+    """
+    Returns the jump distribution over sorted `pages` as a vector:
+    uniform, or proportional to `teleport`, given as {page: weight} or
+    as a collection of pages to weight equally. Pages not in `pages`
+    are ignored.
+    """
+    num_pages = len(pages)
+    if teleport is None:
+        return np.full(num_pages, 1 / num_pages)
+    if not isinstance(teleport, dict):
+        teleport = dict.fromkeys(teleport, 1)
+    vector = np.zeros(num_pages)
+    for page, weight in teleport.items():
+        i = bisect_left(pages, page)
+        if i < num_pages and pages[i] == page:
+            vector[i] += weight
+    total = vector.sum()
+    if total <= 0:
+        raise ValueError("teleport distribution has no weight on any page in the corpus")
+    return vector / total
+
+def sample_pagerank(corpus, damping_factor, n, walkers=WALKERS):
+    """
+    Returns PageRank values for each page by counting the pages visited
+    in `n` samples of the random surfer model. The samples come from up
+    to `walkers` independent surfers stepped together as NumPy arrays,
+    each starting on a random page and taking burn_in_steps steps before
+    its visits are counted.
+    """
+    graph = LinkGraph(corpus)
+    num_pages = len(graph.pages)
+    rng = np.random.default_rng()
+    walkers = max(1, min(walkers, n))
+    current = rng.integers(num_pages, size=walkers)
+    visits = np.zeros(num_pages, dtype=np.int64)
+
+    def advance(current):
+        # Follow a random link with probability damping_factor if there is
+        # one, otherwise jump to a random page
+        follow = (rng.random(walkers) < damping_factor) & ~graph.dangling[current]
+        link = graph.offsets[current] + (rng.random(walkers) * graph.out_degree[current]).astype(np.int64)
+        next_pages = rng.integers(num_pages, size=walkers)
+        next_pages[follow] = graph.targets[link[follow]]
+        return next_pages
 
-    for _ in range(n):
-        pagerank[sample] += 1
-        distribution = transition_model(corpus, sample, damping_factor)
-        sample = random.choices(list(distribution.keys()), weights=distribution.values(), k=1)[0]
+    # Walkers start uniformly, so discard their first steps; otherwise
+    # many short walks pull the estimate towards uniform
+    for _ in range(burn_in_steps(damping_factor)):
+        current = advance(current)
 
-    pagerank = {page: rank / n for page, rank in pagerank.items()}
-    return pagerank
+    counted = 0
+    while counted < n:
+        taken = min(walkers, n - counted)
+        np.add.at(visits, current[:taken], 1)
+        counted += taken
+        current = advance(current)
 
-def iterate_pagerank(corpus, damping_factor):
-    num_pages = len(corpus)
-    pagerank = {page: 1 / num_pages for page in corpus}
-    new_pagerank = pagerank.copy()
+    return dict(zip(graph.pages, (visits / n).tolist()))
 
+def burn_in_steps(damping_factor):
+    """
+    Returns how many steps a surfer takes before its position no longer
+    depends on where it started, to within MIXING_ERROR: the start's
+    influence decays by damping_factor per step.
+    """
+    if damping_factor <= 0:
+        return 0
+    if damping_factor >= 1:
+        return MAX_BURN_IN
+    return min(MAX_BURN_IN, math.ceil(math.log(MIXING_ERROR) / math.log(damping_factor)))
+
+class Convergence():
+    """
+    Record of a solver run: the residual (largest change in any rank)
+    after each sweep, and the seconds elapsed when it was measured.
+    """
+
+    def __init__(self):
+        self.residuals = []
+        self.times = []
+        self.start = time.perf_counter()
+
+    def record(self, residual):
+        self.residuals.append(float(residual))
+        self.times.append(self.elapsed())
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE, initial=None,
+                     solver="power", convergence=None, teleport=None):
+    """
+    Returns PageRank values for each page by iterating on the sparse
+    link matrix with the named solver (see SOLVERS), stopping once no
+    rank changes by `tolerance` or more in a sweep.
+
+    Iteration starts from the uniform distribution, or warm-starts from
+    the `initial` ranks of an earlier run if given. Each sweep's residual
+    is recorded in `convergence` if given. Passing a `teleport`
+    distribution (see teleport_vector) gives personalized PageRank.
+    """
+    graph = LinkGraph(corpus)
+    ranks = starting_ranks(graph.pages, initial)
+    if convergence is None:
+        convergence = Convergence()
+    teleport = teleport_vector(graph.pages, teleport)
+    ranks = SOLVERS[solver](graph, ranks, damping_factor, tolerance, convergence, teleport)
+    return dict(zip(graph.pages, ranks.tolist()))
+
+def power_iteration(graph, ranks, damping_factor, tolerance, convergence, teleport=None):
+    """
+    Repeats power-iteration sweeps until the residual drops below
+    `tolerance`, returning the last rank vector (or matrix).
+    """
     while True:
-        for page in corpus:
-            total = 0
-            for linking_page in corpus:
-                if page in corpus[linking_page]:
-                    total += pagerank[linking_page] / len(corpus[linking_page])
-                if not corpus[linking_page]:
-                    total += pagerank[linking_page] / num_pages
+        new_ranks = graph.step(ranks, damping_factor, teleport)
+        residual = np.abs(new_ranks - ranks).max()
+        convergence.record(residual)
+        if residual < tolerance:
+            return new_ranks
+        ranks = new_ranks
 
-            new_pagerank[page] = (1 - damping_factor) / num_pages + damping_factor * total
+def gauss_seidel(graph, ranks, damping_factor, tolerance, convergence, teleport=None):
+    """
+    Block Gauss-Seidel: each sweep updates the pages in
+    GAUSS_SEIDEL_BLOCKS contiguous blocks in turn, and later blocks use
+    the ranks earlier blocks have just updated. Within a block the
+    update is vectorized like a power-iteration step.
+    """
+    num_pages = len(graph.pages)
+    ranks = ranks.copy()
+    if teleport is None:
+        teleport = np.full(num_pages, 1 / num_pages)
+    bounds = np.linspace(0, num_pages, min(GAUSS_SEIDEL_BLOCKS, num_pages) + 1).astype(np.int64)
+
+    while True:
+        dangling = ranks[graph.dangling].sum()
+        residual = 0
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            # A block's incoming links are contiguous in the by-target order
+            links = slice(graph.in_offsets[start], graph.in_offsets[end])
+            sources = graph.in_sources[links]
+            spread = np.bincount(
+                graph.in_targets[links] - start,
+                weights=ranks[sources] * graph.link_weight[sources],
+                minlength=end - start
+            )
+            jump = teleport[start:end]
+            new_block = (1 - damping_factor) * jump + damping_factor * (spread + dangling * jump)
+            change = new_block - ranks[start:end]
+            residual = max(residual, np.abs(change).max())
+            dangling += change[graph.dangling[start:end]].sum()
+            ranks[start:end] = new_block
+        convergence.record(residual)
+        if residual < tolerance:
+            return ranks / ranks.sum()
+
+def extrapolated_power_iteration(graph, ranks, damping_factor, tolerance, convergence, teleport=None):
+    """
+    Power iteration with geometric extrapolation: every
+    EXTRAPOLATION_INTERVAL sweeps, the ratio between the last two steps
+    estimates how fast the error is shrinking, and the iterate jumps
+    ahead to the limit of that geometric series. The jump is kept only
+    if the sweep from it has a smaller residual than the plain sweep.
+    """
+    previous_step = None
+    sweep = 0
+    while True:
+        new_ranks = graph.step(ranks, damping_factor, teleport)
+        step = new_ranks - ranks
+        residual = np.abs(step).max()
+        convergence.record(residual)
+        if residual < tolerance:
+            return new_ranks
+        sweep += 1
+
+        if sweep % EXTRAPOLATION_INTERVAL == 0 and previous_step is not None:
+            ratio = np.linalg.norm(step) / np.linalg.norm(previous_step)
+            if 0 < ratio < 1:
+                # Trying the jump costs a sweep of its own
+                jumped = np.clip(new_ranks + step * ratio / (1 - ratio), 0, None)
+                jumped /= jumped.sum()
+                jumped_ranks = graph.step(jumped, damping_factor, teleport)
+                jumped_step = jumped_ranks - jumped
+                jumped_residual = np.abs(jumped_step).max()
+                convergence.record(jumped_residual)
+                if jumped_residual < tolerance:
+                    return jumped_ranks
+                if jumped_residual < residual:
+                    new_ranks = jumped_ranks
+                    step = jumped_step
+
+        previous_step = step
+        ranks = new_ranks
+
+# Solvers selectable by name in iterate_pagerank and on the command line
+SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "extrapolated": extrapolated_power_iteration
+}
+
+def personalized_pagerank(corpus, damping_factor, seeds, tolerance=TOLERANCE, convergence=None):
+    """
+    Returns {name: {page: rank}} for each personalized PageRank in
+    `seeds`, a {name: teleport} dict (see teleport_vector). All of them
+    are solved together by power iteration on a matrix with one column
+    per seed, sharing the link matrix and each sweep between seeds;
+    a seed's column stops being updated once it has converged.
+    """
+    graph = LinkGraph(corpus)
+    names = list(seeds)
+    if not names:
+        return {}
+    teleport = np.asfortranarray(
+        np.column_stack([teleport_vector(graph.pages, seeds[name]) for name in names])
+    )
+    if convergence is None:
+        convergence = Convergence()
+
+    # Power iteration on every seed that has not converged yet
+    ranks = teleport.copy(order="F")
+    active = np.arange(len(names))
+    while active.size:
+        previous = ranks[:, active]
+        new_ranks = graph.step(previous, damping_factor, teleport[:, active])
+        residuals = np.abs(new_ranks - previous).max(axis=0)
+        convergence.record(residuals.max())
+        ranks[:, active] = new_ranks
+        active = active[residuals >= tolerance]
+
+    return {
+        name: dict(zip(graph.pages, ranks[:, column].tolist()))
+        for column, name in enumerate(names)
+    }
+
+def starting_ranks(pages, initial=None):
+    """
+    Returns the rank vector iteration starts from: uniform, or the
+    `initial` ranks with pages they lack given the uniform share,
+    renormalized to sum to 1.
+    """
+    num_pages = len(pages)
+    if initial is None:
+        return np.full(num_pages, 1 / num_pages)
+    ranks = np.array([initial.get(page, 1 / num_pages) for page in pages])
+    total = ranks.sum()
+    if total <= 0:
+        return np.full(num_pages, 1 / num_pages)
+    return ranks / total
+
+def iterate_pagerank_edges(path, damping_factor, tolerance=TOLERANCE, initial=None,
+                           convergence=None, block_size=EDGE_BLOCK):
+    """
+    Returns PageRank values for each page of an edge file written by
+    build_edge_file, by power iteration that streams the memory-mapped
+    links in blocks of `block_size` every sweep. Only per-page vectors
+    are held in memory, never the links.
+    """
+    with open(path, "rb") as f:
+        magic, version, num_pages, num_edges = EDGE_HEADER.unpack(f.read(EDGE_HEADER.size))
+    if magic != EDGE_MAGIC or version != EDGE_VERSION:
+        raise ValueError(f"{path} is not a version {EDGE_VERSION} edge file")
+    with open(f"{path}.pages", encoding="utf-8") as f:
+        pages = [json.loads(line) for line in f]
+
+    edges = np.memmap(path, dtype=np.int32, mode="r", offset=EDGE_HEADER.size, shape=(num_edges, 2))
+    blocks = [(start, min(start + block_size, num_edges)) for start in range(0, num_edges, block_size)]
+
+    out_degree = np.zeros(num_pages, dtype=np.int64)
+    for start, end in blocks:
+        out_degree += np.bincount(edges[start:end, 0], minlength=num_pages)
+    dangling = out_degree == 0
+    link_weight = np.divide(1, out_degree, out=np.zeros(num_pages), where=~dangling)
+
+    ranks = starting_ranks(pages, initial)
+    if convergence is None:
+        convergence = Convergence()
+    while True:
+        weighted = ranks * link_weight
+        spread = np.zeros(num_pages)
+        for start, end in blocks:
+            block = edges[start:end]
+            spread += np.bincount(block[:, 1], weights=weighted[block[:, 0]], minlength=num_pages)
+        new_ranks = (1 - damping_factor) / num_pages + damping_factor * (
+            spread + ranks[dangling].sum() / num_pages
+        )
+        residual = np.abs(new_ranks - ranks).max()
+        convergence.record(residual)
+        if residual < tolerance:
+            return dict(zip(pages, new_ranks.tolist()))
+        ranks = new_ranks
+
+def apply_diff(corpus, added_pages=(), removed_pages=(), added_links=(), removed_links=()):
+    """
+    Returns a copy of `corpus` with pages added and removed, and
+    (page, link) pairs added and removed. Links to removed or unknown
+    pages are dropped.
+    """
+    removed_pages = set(removed_pages)
+    pages = {page: set(links) for page, links in corpus.items() if page not in removed_pages}
+    for page in added_pages:
+        pages.setdefault(page, set())
+    for page, link in removed_links:
+        if page in pages:
+            pages[page].discard(link)
+    for page, link in added_links:
+        if page in pages and link != page:
+            pages[page].add(link)
+    for page in pages:
+        pages[page] = {link for link in pages[page] if link in pages}
+    return pages
 
-        if max(abs(new_pagerank[page] - pagerank[page]) for page in corpus) < 0.001:
-            break
+def update_pagerank(corpus, ranks, damping_factor, added_pages=(), removed_pages=(),
+                    added_links=(), removed_links=(), tolerance=TOLERANCE):
+    """
+    Applies a diff to `corpus` and re-ranks it starting from the
+    previous `ranks`, which needs far fewer sweeps than starting over
+    when the corpus changes only slightly.
+    Returns the new corpus and its ranks.
+    """
+    corpus = apply_diff(corpus, added_pages, removed_pages, added_links, removed_links)
+    return corpus, iterate_pagerank(corpus, damping_factor, tolerance, initial=ranks)
 
-        pagerank = new_pagerank.copy()
+def read_ranks(path):
+    """
+    Returns {page: rank} from a file written by write_ranks,
+    or None if it does not exist.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {page: float(rank) for page, rank in (line.rstrip("\n").rsplit("\t", 1) for line in f)}
+    except FileNotFoundError:
+        return None
 
-    return pagerank
+def write_ranks(path, ranks):
+    """
+    Write {page: rank} to `path`, one tab-separated page and rank per line.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        for page in sorted(ranks):
+            f.write(f"{page}\t{ranks[page]!r}\n")
 
 if __name__ == "__main__":
     main()
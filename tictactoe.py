@@ -1,10 +1,77 @@
 import math
-import copy
+import multiprocessing
+import os
+import sys
+import time
+from array import array
+from functools import lru_cache
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Boards can also be held as bitboards: a pair (x, o) of m * n bit integers
+# with bit n * i + j set where that player has moved on cell (i, j). The
+# exact solver below is for the 3x3 board; Game handles any m, n and k
+FULL = 0b111111111
+LINES = [
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100,               # diagonals
+]
+
+# Cell permutations for the eight symmetries of the board (rotations and
+# reflections), as (row, column) of the source cell for each target cell
+SYMMETRIES = [
+    [transform(i, j) for i in range(3) for j in range(3)]
+    for transform in (
+        lambda i, j: (i, j),
+        lambda i, j: (2 - j, i),
+        lambda i, j: (2 - i, 2 - j),
+        lambda i, j: (j, 2 - i),
+        lambda i, j: (i, 2 - j),
+        lambda i, j: (2 - i, j),
+        lambda i, j: (j, i),
+        lambda i, j: (2 - j, 2 - i),
+    )
+]
+
+# For each symmetry, the image of every 9-bit mask under it
+SYMMETRY_MASKS = [
+    [
+        sum(1 << cell for cell, (i, j) in enumerate(symmetry) if mask >> (3 * i + j) & 1)
+        for mask in range(FULL + 1)
+    ]
+    for symmetry in SYMMETRIES
+]
+
+# Bound types for transposition table entries
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Opening book of optimal moves for every reachable position, up to symmetry.
+# Each entry packs a canonical key (18 bits) with the move's cell above it
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tictactoe.book")
+BOOK_MAGIC = b"TTTBOOK1"
+BOOK_CELL_SHIFT = 18
+
+# Opening book loaded by opening_book: None until first use, then a dict
+# from canonical key to cell, empty if there is no book file
+book = None
+
+# Boards other than 3x3 are searched heuristically: iterative deepening
+# within TIME_LIMIT seconds, trying at most BRANCHING moves per position,
+# all of them within NEIGHBORHOOD cells of a stone already played
+TIME_LIMIT = 1.0
+BRANCHING = 16
+NEIGHBORHOOD = 2
+WIN_SCORE = 10 ** 9
+
+# Minimax values of positions seen so far, keyed by canonical board
+# encoding and shared by every call in this process
+transposition_table = {}
+
 def initial_state():
     """
     Returns starting state of the board.
@@ -13,19 +80,58 @@ def initial_state():
             [EMPTY, EMPTY, EMPTY],
             [EMPTY, EMPTY, EMPTY]]
 
+def to_bits(board):
+    """
+    Returns the bitboard (x, o) for a list board.
+    """
+    n = len(board[0])
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (n * i + j)
+            elif cell == O:
+                o |= 1 << (n * i + j)
+    return x, o
+
+def from_bits(bits, m=3, n=3):
+    """
+    Returns the m x n list board for a bitboard (x, o).
+    """
+    x, o = bits
+    return [
+        [X if x >> (n * i + j) & 1 else O if o >> (n * i + j) & 1 else EMPTY for j in range(n)]
+        for i in range(m)
+    ]
+
+def game_for(board, k=None):
+    """
+    Returns the Game for the shape of a list board, with k in a row to
+    win (by default 3 on 3x3 boards and up to 5 on larger ones).
+    """
+    m, n = len(board), len(board[0])
+    return game(m, n, k or min(m, n, 5))
+
+@lru_cache(maxsize=None)
+def game(m, n, k):
+    """
+    Returns the shared Game for m x n boards with k in a row to win.
+    """
+    return Game(m, n, k)
+
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    x_count = sum(row.count(X) for row in board)
-    o_count = sum(row.count(O) for row in board)
-    return X if x_count == o_count else O
+    return bits_player(to_bits(board))
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    return {(i, j) for i in range(3) for j in range(3) if board[i][j] is EMPTY}
+    n = len(board[0])
+    bits = to_bits(board)
+    return {divmod(move.bit_length() - 1, n) for move in game_for(board).actions(bits)}
 
 def result(board, action):
     """
@@ -33,39 +139,88 @@ def result(board, action):
     """
     if board[action[0]][action[1]] is not EMPTY:
         raise ValueError("Invalid action")
-    
-    new_board = copy.deepcopy(board)
-    new_board[action[0]][action[1]] = player(board)
-    return new_board
 
-def winner(board):
+    m, n = len(board), len(board[0])
+    return from_bits(bits_result(to_bits(board), 1 << (n * action[0] + action[1])), m, n)
+
+def winner(board, k=None):
     """
     Returns the winner of the game, if there is one.
     """
-    for i in range(3):
-        if board[i][0] == board[i][1] == board[i][2] != EMPTY:
-            return board[i][0]
-        if board[0][i] == board[1][i] == board[2][i] != EMPTY:
-            return board[0][i]
-    
-    if board[0][0] == board[1][1] == board[2][2] != EMPTY:
-        return board[0][0]
-    if board[0][2] == board[1][1] == board[2][0] != EMPTY:
-        return board[0][2]
-    
-    return None
+    return game_for(board, k).winner(to_bits(board))
 
-def terminal(board):
+def terminal(board, k=None):
     """
     Returns True if game is over, False otherwise.
     """
-    return winner(board) is not None or all(cell is not EMPTY for row in board for cell in row)
+    return game_for(board, k).terminal(to_bits(board))
 
-def utility(board):
+def utility(board, k=None):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    win = winner(board)
+    win = winner(board, k)
+    if win == X:
+        return 1
+    elif win == O:
+        return -1
+    else:
+        return 0
+
+def bits_player(bits):
+    """
+    Returns player who has the next turn on a bitboard.
+    """
+    x, o = bits
+    return X if x.bit_count() == o.bit_count() else O
+
+def bits_actions(bits):
+    """
+    Returns the list of empty cells on a 3x3 bitboard, each as a one-bit mask.
+    """
+    x, o = bits
+    free = FULL & ~(x | o)
+    moves = []
+    while free:
+        move = free & -free
+        moves.append(move)
+        free ^= move
+    return moves
+
+def bits_result(bits, move):
+    """
+    Returns the bitboard that results from the next player taking the
+    cell given by the one-bit mask `move`.
+    """
+    x, o = bits
+    if x.bit_count() == o.bit_count():
+        return x | move, o
+    return x, o | move
+
+def bits_winner(bits):
+    """
+    Returns the winner on a 3x3 bitboard, if there is one.
+    """
+    x, o = bits
+    for line in LINES:
+        if x & line == line:
+            return X
+        if o & line == line:
+            return O
+    return None
+
+def bits_terminal(bits):
+    """
+    Returns True if the game on a 3x3 bitboard is over, False otherwise.
+    """
+    x, o = bits
+    return x | o == FULL or bits_winner(bits) is not None
+
+def bits_utility(bits):
+    """
+    Returns 1 if X has won on a 3x3 bitboard, -1 if O has won, 0 otherwise.
+    """
+    win = bits_winner(bits)
     if win == X:
         return 1
     elif win == O:
@@ -73,47 +228,542 @@ def utility(board):
     else:
         return 0
 
-def minimax(board):
+def canonical(bits):
+    """
+    Returns (key, symmetry) for a bitboard: an integer encoding that is
+    the same for all eight rotations and reflections of it, and the index
+    into SYMMETRIES of the symmetry that maps the board onto that key.
+    """
+    x, o = bits
+    return min((masks[x] | masks[o] << 9, symmetry) for symmetry, masks in enumerate(SYMMETRY_MASKS))
+
+def canonical_key(bits):
+    """
+    Returns an integer encoding of a bitboard that is the same for all
+    eight rotations and reflections of it.
+    """
+    x, o = bits
+    return min(masks[x] | masks[o] << 9 for masks in SYMMETRY_MASKS)
+
+def alphabeta(bits, alpha, beta):
+    """
+    Returns the minimax value of a bitboard, searching with alpha-beta
+    pruning and reusing values from the transposition table. Values
+    outside (alpha, beta) are only bounds on the true value.
+    """
+    if bits_terminal(bits):
+        return bits_utility(bits)
+
+    key = canonical_key(bits)
+    entry = transposition_table.get(key)
+    if entry is not None:
+        value, bound = entry
+        if bound == EXACT:
+            return value
+        if bound == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    original_alpha, original_beta = alpha, beta
+    if bits_player(bits) == X:
+        value = -math.inf
+        for move in bits_actions(bits):
+            value = max(value, alphabeta(bits_result(bits, move), alpha, beta))
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+    else:
+        value = math.inf
+        for move in bits_actions(bits):
+            value = min(value, alphabeta(bits_result(bits, move), alpha, beta))
+            beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+    if value <= original_alpha:
+        transposition_table[key] = (value, UPPER)
+    elif value >= original_beta:
+        transposition_table[key] = (value, LOWER)
+    else:
+        transposition_table[key] = (value, EXACT)
+    return value
+
+def minimax(board, k=None, time_limit=TIME_LIMIT, workers=1):
     """
     Returns the optimal action for the current player on the board.
+    Boards other than 3x3 with 3 in a row are searched heuristically,
+    returning the best action found within `time_limit` seconds, across
+    `workers` processes if more than one.
     """
-    if terminal(board):
+    search_game = game_for(board, k)
+    bits = to_bits(board)
+    if search_game.terminal(bits):
         return None
-    
-    current_player = player(board)
-
-    def max_value(board):
-        if terminal(board):
-            return utility(board)
-        v = -math.inf
-        for action in actions(board):
-            v = max(v, min_value(result(board, action)))
-        return v
-
-    def min_value(board):
-        if terminal(board):
-            return utility(board)
-        v = math.inf
-        for action in actions(board):
-            v = min(v, max_value(result(board, action)))
-        return v
-    
-    if current_player == X:
+    if (search_game.m, search_game.n, search_game.k) != (3, 3, 3):
+        if workers > 1:
+            move = search_game.search_parallel(bits, workers, time_limit)
+        else:
+            move = search_game.search(bits, time_limit)
+        return divmod(move.bit_length() - 1, search_game.n)
+
+    # Answer from the opening book when there is one
+    key, symmetry = canonical(bits)
+    cell = opening_book().get(key)
+    if cell is not None:
+        return SYMMETRIES[symmetry][cell]
+
+    return divmod(best_move(bits).bit_length() - 1, 3)
+
+def best_move(bits):
+    """
+    Returns the optimal move, as a one-bit mask, for the current player
+    on a non-terminal bitboard.
+    """
+    # Each root action only needs to be searched for a better value than
+    # the best found so far; stop early once a win is found
+    best = None
+    if bits_player(bits) == X:
         best_value = -math.inf
-        best_action = None
-        for action in actions(board):
-            action_value = min_value(result(board, action))
-            if action_value > best_value:
-                best_value = action_value
-                best_action = action
+        for move in bits_actions(bits):
+            move_value = alphabeta(bits_result(bits, move), best_value, math.inf)
+            if move_value > best_value:
+                best_value = move_value
+                best = move
+                if best_value == 1:
+                    break
     else:
         best_value = math.inf
-        best_action = None
-        for action in actions(board):
-            action_value = max_value(result(board, action))
-            if action_value < best_value:
-                best_value = action_value
-                best_action = action
+        for move in bits_actions(bits):
+            move_value = alphabeta(bits_result(bits, move), -math.inf, best_value)
+            if move_value < best_value:
+                best_value = move_value
+                best = move
+                if best_value == -1:
+                    break
+    return best
+
+def solve_positions():
+    """
+    Solve every reachable non-terminal position once, up to symmetry.
+    Returns a dict from canonical key to the cell of the optimal move
+    on the canonical board.
+    """
+    moves = {}
+    frontier = [(0, 0)]
+    while frontier:
+        bits = frontier.pop()
+        key, symmetry = canonical(bits)
+        if key in moves or bits_terminal(bits):
+            continue
+
+        # Solve the canonical board itself, so the cell is in its orientation
+        canonical_bits = key & FULL, key >> 9
+        moves[key] = best_move(canonical_bits).bit_length() - 1
+        frontier.extend(bits_result(canonical_bits, move) for move in bits_actions(canonical_bits))
+    return moves
+
+def write_book(path=BOOK_FILE):
+    """
+    Solve every reachable position and write the opening book to `path`.
+    Returns the number of positions in the book.
+    """
+    moves = solve_positions()
+    entries = array("I", sorted(key | cell << BOOK_CELL_SHIFT for key, cell in moves.items()))
+
+    # Write to a temporary file first so readers never see a partial book
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(BOOK_MAGIC)
+        f.write(entries.tobytes())
+    os.replace(temporary, path)
+    return len(entries)
+
+def read_book(path=BOOK_FILE):
+    """
+    Returns the opening book at `path` as a dict from canonical key to
+    cell, or None if there is no valid book there.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if not data.startswith(BOOK_MAGIC):
+        return None
+
+    # A truncated or corrupt book is no book: fall back to searching
+    entries = array("I")
+    payload = data[len(BOOK_MAGIC):]
+    if len(payload) % entries.itemsize:
+        return None
+    entries.frombytes(payload)
+    mask = (1 << BOOK_CELL_SHIFT) - 1
+    moves = {entry & mask: entry >> BOOK_CELL_SHIFT for entry in entries}
+    if any(cell > 8 for cell in moves.values()):
+        return None
+    return moves
+
+def opening_book():
+    """
+    Returns the opening book, reading it on first use. Without a book
+    file this is an empty dict and minimax falls back to searching.
+    """
+    global book
+    if book is None:
+        book = read_book() or {}
+    return book
+
+class SearchTimeout(Exception):
+    """
+    Raised inside Game.search when its time budget runs out.
+    """
+
+class Game():
+    """
+    Heuristic search for an m x n board with k in a row to win, on
+    bitboards with bit n * i + j for cell (i, j).
+    """
+
+    def __init__(self, m, n, k):
+        self.m = m
+        self.n = n
+        self.k = k
+        self.full = (1 << (m * n)) - 1
+
+        # Every run of k cells in a row, column or diagonal, and the runs
+        # through each cell
+        self.windows = []
+        for i in range(m):
+            for j in range(n):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    if 0 <= i + di * (k - 1) < m and 0 <= j + dj * (k - 1) < n:
+                        self.windows.append(
+                            sum(1 << (n * (i + di * step) + j + dj * step) for step in range(k))
+                        )
+        self.cell_windows = [
+            [window for window in self.windows if window >> cell & 1]
+            for cell in range(m * n)
+        ]
+
+        # Cells close enough to each cell to be worth playing
+        self.neighborhoods = [
+            sum(
+                1 << (n * i + j)
+                for i in range(max(0, row - NEIGHBORHOOD), min(m, row + NEIGHBORHOOD + 1))
+                for j in range(max(0, column - NEIGHBORHOOD), min(n, column + NEIGHBORHOOD + 1))
+            )
+            for row, column in (divmod(cell, n) for cell in range(m * n))
+        ]
+
+        # Heuristic value of a run holding only one player's stones, by count
+        self.weights = [0] + [4 ** count for count in range(1, k)] + [WIN_SCORE]
+
+        # Statistics of the last search: positions visited and the
+        # deepest search completed
+        self.nodes = 0
+        self.depth = 0
+        self.deadline = None
+        self.best_moves = {}
+
+    def actions(self, bits):
+        """
+        Returns the list of empty cells on a bitboard, each as a one-bit mask.
+        """
+        x, o = bits
+        free = self.full & ~(x | o)
+        moves = []
+        while free:
+            move = free & -free
+            moves.append(move)
+            free ^= move
+        return moves
+
+    def winner(self, bits):
+        """
+        Returns the winner on a bitboard, if there is one.
+        """
+        x, o = bits
+        for window in self.windows:
+            if x & window == window:
+                return X
+            if o & window == window:
+                return O
+        return None
+
+    def terminal(self, bits):
+        """
+        Returns True if the game on a bitboard is over, False otherwise.
+        """
+        x, o = bits
+        return x | o == self.full or self.winner(bits) is not None
+
+    def evaluate(self, bits):
+        """
+        Returns the heuristic value of a bitboard for X: every run that
+        only one player has stones in counts for that player, by weight.
+        """
+        x, o = bits
+        score = 0
+        for window in self.windows:
+            if not x & window:
+                score -= self.weights[(o & window).bit_count()]
+            elif not o & window:
+                score += self.weights[(x & window).bit_count()]
+        return score
+
+    def gain(self, own, other, cell):
+        """
+        Returns (gain, win) for the player with stones `own` playing
+        `cell`: how much the heuristic value rises, and whether the move
+        completes a run of k and so wins the game.
+        """
+        gain = 0
+        win = False
+        for window in self.cell_windows[cell]:
+            if other & window:
+                if not own & window:
+                    gain += self.weights[(other & window).bit_count()]
+            else:
+                count = (own & window).bit_count()
+                gain += self.weights[count + 1] - self.weights[count]
+                if count + 1 == self.k:
+                    win = True
+        return gain, win
+
+    def candidates(self, bits, near):
+        """
+        Returns the moves worth trying on a bitboard, best first, as a
+        list of (gain, win, cell, move): empty cells near a played stone,
+        winning moves first and the rest ordered by the player's own gain
+        plus half the gain denied to the opponent.
+        """
+        x, o = bits
+        own, other = (x, o) if x.bit_count() == o.bit_count() else (o, x)
+        free = near & ~(x | o)
+        if not x | o:
+            free = 1 << (self.n * (self.m // 2) + self.n // 2)
+
+        moves = []
+        while free:
+            move = free & -free
+            free ^= move
+            cell = move.bit_length() - 1
+            gain, win = self.gain(own, other, cell)
+            moves.append((win, gain + self.gain(other, own, cell)[0] // 2, gain, cell, move))
+        moves.sort(reverse=True)
+
+        # Try the best move from the previous, shallower search first
+        previous = self.best_moves.get(bits)
+        if previous is not None:
+            moves.sort(key=lambda entry: entry[4] != previous)
+        return [(gain, win, cell, move) for win, _, gain, cell, move in moves]
+
+    def negamax(self, bits, score, near, depth, alpha, beta, ply):
+        """
+        Returns the value of a bitboard for the player to move, searching
+        `depth` moves ahead with alpha-beta pruning. `score` is the
+        heuristic value for the player to move and `near` the cells
+        around stones already played.
+        """
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        if depth == 0:
+            return score
+        moves = self.candidates(bits, near)
+        if not moves:
+            return 0
+        if depth == 1 and ply > 0:
+            # The last move needs no recursion: its value is the score
+            # after the largest gain
+            if any(win for _, win, _, _ in moves):
+                return WIN_SCORE - ply
+            return score + max(gain for gain, _, _, _ in moves)
+
+        x, o = bits
+        x_to_move = x.bit_count() == o.bit_count()
+        best_value = -math.inf
+        best = None
+        for gain, win, cell, move in moves[:BRANCHING]:
+            if win:
+                value = WIN_SCORE - ply
+            else:
+                child = (x | move, o) if x_to_move else (x, o | move)
+                value = -self.negamax(
+                    child, -(score + gain), near | self.neighborhoods[cell],
+                    depth - 1, -beta, -alpha, ply + 1
+                )
+            if value > best_value:
+                best_value = value
+                best = move
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+        self.best_moves[bits] = best
+        return best_value
+
+    def start(self, bits):
+        """
+        Returns (score, near) for the root of a search on a bitboard: the
+        heuristic value for the player to move and the cells around
+        stones already played.
+        """
+        x, o = bits
+        score = self.evaluate(bits)
+        if x.bit_count() != o.bit_count():
+            score = -score
+        near = 0
+        for cell in range(self.m * self.n):
+            if (x | o) >> cell & 1:
+                near |= self.neighborhoods[cell]
+        return score, near
+
+    def search(self, bits, time_limit=TIME_LIMIT, max_depth=None):
+        """
+        Returns the best move found on a non-terminal bitboard, as a one-bit
+        mask, by iterative deepening until `time_limit` seconds have passed,
+        `max_depth` is reached or the game is decided.
+        """
+        self.deadline = time.perf_counter() + time_limit
+        self.nodes = 0
+        self.depth = 0
+        self.best_moves = {}
+
+        score, near = self.start(bits)
+        best = self.candidates(bits, near)[0][3]
+        empty = self.m * self.n - (bits[0] | bits[1]).bit_count()
+        for depth in range(1, min(empty, max_depth or empty) + 1):
+            try:
+                value = self.negamax(bits, score, near, depth, -math.inf, math.inf, 0)
+            except SearchTimeout:
+                break
+            best = self.best_moves.get(bits, best)
+            self.depth = depth
+            if abs(value) >= WIN_SCORE - self.m * self.n:
+                break
+        return best
+
+    def search_parallel(self, bits, workers, time_limit=TIME_LIMIT, max_depth=None):
+        """
+        Returns the same move as `search`, splitting each iteration's root
+        moves across a pool of `workers` processes. Workers share the best
+        root value found so far, and search each move only for values that
+        could match or beat it.
+        """
+        pool, shared_alpha = search_pool(workers)
+        deadline = time.time() + time_limit
+        self.nodes = 0
+        self.depth = 0
+        self.best_moves = {}
+
+        score, near = self.start(bits)
+        x, o = bits
+        x_to_move = x.bit_count() == o.bit_count()
+        best = self.candidates(bits, near)[0][3]
+        empty = self.m * self.n - (x | o).bit_count()
+        for depth in range(1, min(empty, max_depth or empty) + 1):
+            self.nodes += 1
+            moves = self.candidates(bits, near)[:BRANCHING]
+
+            # A move that wins at once beats anything a worker could find
+            wins = [move for _, win, _, move in moves if win]
+            if wins:
+                self.best_moves[bits] = best = wins[0]
+                self.depth = depth
+                break
+
+            shared_alpha.value = -WIN_SCORE
+            tasks = [
+                (
+                    self.m, self.n, self.k,
+                    (x | move, o) if x_to_move else (x, o | move),
+                    -(score + gain), near | self.neighborhoods[cell],
+                    depth - 1, deadline,
+                )
+                for gain, _, cell, move in moves
+            ]
+            results = pool.map(search_root_move, tasks, chunksize=1)
+            self.nodes += sum(nodes for _, nodes in results)
+            if any(value is None for value, _ in results):
+                break
+
+            # Ties go to the earliest move, as in the sequential search
+            value, index = max((value, -index) for index, (value, _) in enumerate(results))
+            self.best_moves[bits] = best = moves[-index][3]
+            self.depth = depth
+            if abs(value) >= WIN_SCORE - self.m * self.n:
+                break
+        return best
+
+# Worker processes for Game.search_parallel, by number of workers, each
+# with the value shared between its workers
+search_pools = {}
+
+# Best root value found so far in the current iteration, shared between
+# the workers of a search pool; set by init_search_worker
+shared_alpha = None
+
+# Deadline of the search a worker last took part in, to tell when a new
+# search starts
+worker_deadline = None
+
+def search_pool(workers):
+    """
+    Returns (pool, alpha) for `workers` search processes, starting them
+    on first use and reusing them after that.
+    """
+    if workers not in search_pools:
+        alpha = multiprocessing.Value("q", -WIN_SCORE)
+        pool = multiprocessing.Pool(workers, initializer=init_search_worker, initargs=(alpha,))
+        search_pools[workers] = pool, alpha
+    return search_pools[workers]
+
+def init_search_worker(alpha):
+    """
+    Initialize a search process with the shared root value.
+    """
+    global shared_alpha
+    shared_alpha = alpha
+
+def search_root_move(task):
+    """
+    Search the position after one root move. Returns (value, nodes) with
+    the value for the player at the root, or None as the value if the
+    deadline passed.
+    """
+    global worker_deadline
+    m, n, k, bits, score, near, depth, deadline = task
+    search_game = game(m, n, k)
+    if deadline != worker_deadline:
+        worker_deadline = deadline
+        search_game.best_moves = {}
+    search_game.deadline = time.perf_counter() + (deadline - time.time())
+    search_game.nodes = 0
+
+    # Values one below the best so far still need to come back exact so
+    # that ties can be broken by move order
+    alpha = shared_alpha.value
+    beta = math.inf if alpha <= -WIN_SCORE else 1 - alpha
+    try:
+        value = -search_game.negamax(bits, score, near, depth, -math.inf, beta, 1)
+    except SearchTimeout:
+        return None, search_game.nodes
+
+    with shared_alpha.get_lock():
+        if value > shared_alpha.value:
+            shared_alpha.value = value
+    return value, search_game.nodes
 
-    return best_action
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python tictactoe.py [book]")
+    path = sys.argv[1] if len(sys.argv) == 2 else BOOK_FILE
+    count = write_book(path)
+    print(f"Wrote {count} positions to {path} ({os.path.getsize(path)} bytes).")
 
+if __name__ == "__main__":
+    main()
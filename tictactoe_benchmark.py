@@ -0,0 +1,87 @@
+import os
+import random
+import sys
+import time
+
+import tictactoe
+
+SIZE = 15
+K = 5
+OPENING_MOVES = 6
+DEPTH = 5
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python tictactoe_benchmark.py [depth]")
+    depth = int(sys.argv[1]) if len(sys.argv) == 2 else DEPTH
+
+    game = tictactoe.game(SIZE, SIZE, K)
+    bits = opening(game, OPENING_MOVES)
+    print(f"{SIZE}x{SIZE}, {K} in a row, {OPENING_MOVES} stones played, "
+          f"searching to depth {depth}.")
+
+    start = time.perf_counter()
+    expected = game.search(bits, time_limit=float("inf"), max_depth=depth)
+    sequential = time.perf_counter() - start
+    report("sequential", game.nodes, sequential, sequential)
+
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    for workers in counts:
+        # Start the pool before timing so only the search is measured
+        tictactoe.search_pool(workers)
+        start = time.perf_counter()
+        move = game.search_parallel(bits, workers, time_limit=float("inf"), max_depth=depth)
+        seconds = time.perf_counter() - start
+        report(f"{workers} worker{'s' if workers > 1 else ''}", game.nodes, seconds, sequential)
+        if move != expected:
+            sys.exit(f"{workers} workers chose a different move")
+
+    # Both searches must take a win even when it scores below WIN_SCORE
+    bits, win = edge_win(game)
+    if game.search(bits, time_limit=float("inf"), max_depth=depth) != win:
+        sys.exit("Sequential search missed a win at the edge")
+    for workers in counts:
+        if game.search_parallel(bits, workers, time_limit=float("inf"), max_depth=depth) != win:
+            sys.exit(f"{workers} workers missed a win at the edge")
+
+def opening(game, moves):
+    """
+    Returns a bitboard with `moves` random stones played near the
+    centre of the board, with no winner.
+    """
+    rng = random.Random(0)
+    centre = game.m // 2
+    x = o = 0
+    for turn in range(moves):
+        while True:
+            cell = game.n * rng.randint(centre - 3, centre + 3) + rng.randint(centre - 3, centre + 3)
+            if not (x | o) >> cell & 1:
+                break
+        if turn % 2 == 0:
+            x |= 1 << cell
+        else:
+            o |= 1 << cell
+    if game.winner((x, o)) is not None:
+        sys.exit("Random opening already has a winner")
+    return x, o
+
+def edge_win(game):
+    """
+    Returns (bits, move) for a position where X, to move, wins with
+    `move` at the end of a top-row run blocked at its other end, while O
+    threatens to win at one end of a run on the next row.
+    """
+    x = sum(1 << (game.n - 2 - step) for step in range(game.k - 1))
+    o = 1 << (game.n - 1 - game.k)
+    o |= sum(1 << (2 * game.n - 2 - game.k - step) for step in range(game.k - 1))
+    x |= 1 << (2 * game.n - 1 - 2 * game.k)
+    return (x, o), 1 << (game.n - 1)
+
+def report(label, nodes, seconds, sequential):
+    print(f"{label:>12}: {nodes} nodes in {seconds:.3f}s "
+          f"({nodes / seconds:,.0f} nodes/sec, {sequential / seconds:.2f}x)")
+
+if __name__ == "__main__":
+    main()